@@ -1,15 +1,6 @@
-import requests
-import time
 import os
-import deepl
-import psycopg2
-from flask import Flask, request, jsonify, send_file, redirect, session
-import json
-from azure.storage.blob import BlobServiceClient
-from onelogin.saml2.auth import OneLogin_Saml2_Auth
-import urllib.parse
-import datetime
-import logging
+# deepl and the SAML stack are imported on first use by the modules that need them
+from flask import Flask, request
 from saml import saml_login, saml_callback, extract_token
 from test_settings_azure import (
     test_translation,
@@ -18,16 +9,12 @@ from test_settings_azure import (
     run_all_operations
 )
 from text_translate_deepl import handle_translation_request
-from delete_containers import delete_old_containers
-from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
-import time
+from delete_containers import delete_old_containers, cleanup_metrics_route, start_cleanup_scheduler
 from retrieve_settings import retrieve_settings
 from storing_user_feedback import store_feedback
 from deepl_key_test import check_api_key
 from deepl_save import save_settings_deepl
 from deepl_get import get_settings_deepl 
-from saml import extract_token
 
 
 app = Flask(__name__)
@@ -114,6 +101,10 @@ def call_multiple_files2():
 def delete_old_containers_route():
     return delete_old_containers()
 
+@app.route('/cleanup/metrics', methods=['GET'])
+def cleanup_metrics_route_handler():
+    return cleanup_metrics_route()
+
 # Route to check API key validity
 @app.route('/settings/deepl/test', methods=['POST'])
 def handle_check_api_key():
@@ -125,6 +116,23 @@ from docu_trans_azure2 import docu_trans_azure2
 def docu_trans2():
     return docu_trans_azure2()
 
+from azure_jobs import get_job_status, start_job_claimer
+@app.route('/translate/azure/documents/<job_id>',methods=['GET'])
+def docu_trans2_status(job_id):
+    return get_job_status(job_id)
+
+
+from db_connection import DB_AUTO_MIGRATE, apply_schema, pool_stats_route
+@app.route('/health/db', methods=['GET'])
+def db_pool_stats():
+    return pool_stats_route()
+
+
+from translation_memory import cache_stats_route
+@app.route('/health/translation-memory', methods=['GET'])
+def translation_memory_stats():
+    return cache_stats_route()
+
 
 from create_glossary_deepl2 import upload_glossary
 @app.route('/upload_glossary',methods=['POST'])
@@ -133,8 +141,24 @@ def call_upload_glossary():
 
 
 
+def start_background_workers():
+    """Start this process's background threads; call once per serving process, after any fork.
+
+    Importing the app starts nothing, so tools and tests can import it freely.
+    Under gunicorn this runs from the post_fork hook in gunicorn.conf.py.
+    """
+    # Tables are normally provisioned from schema.sql; opt in to have the workers create them
+    if DB_AUTO_MIGRATE:
+        apply_schema()
+    # Expired containers and job prefixes are removed on a schedule rather than per request
+    if os.getenv('CLEANUP_SCHEDULER_ENABLED', 'true').lower() == 'true':
+        start_cleanup_scheduler()
+    # Azure jobs left behind by a worker that died are picked up here
+    start_job_claimer()
+
     
 if __name__ == '__main__':
+    start_background_workers()
     # Use the environment variable PORT, or default to port 5000 if not set
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
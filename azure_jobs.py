@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from flask import jsonify, request
+import job_poller
+from db_connection import get_connection
+from job_poller import JobTimeout
+from polling_policy import PollSchedule, azure_progress, get_policy
+
+# Azure document translation jobs are checked by the central job poller; timing comes from the polling policy
+JOB_TIMEOUT = get_policy('azure').timeout  # Give up on a job after this many seconds
+JOB_RETENTION = int(os.getenv('AZURE_JOB_RETENTION', '3600'))  # Keep finished jobs for 1 hour
+# Job records live in Postgres, so any worker can answer a status request and pick up a job whose poller died
+JOB_LEASE_SECONDS = int(os.getenv('AZURE_JOB_LEASE_SECONDS', '120'))  # A claim lapses if not renewed for this long
+JOB_CLAIM_INTERVAL = float(os.getenv('AZURE_JOB_CLAIM_INTERVAL', '15'))  # Look for unclaimed jobs this often
+JOB_CLAIM_BATCH = int(os.getenv('AZURE_JOB_CLAIM_BATCH', '50'))
+JOB_COLLECT_LEASE_SECONDS = int(os.getenv('AZURE_JOB_COLLECT_LEASE_SECONDS', '3600'))  # Held while results are copied
+# Finished jobs are collected (listed, signed, copied into the result cache) off the poller's check threads
+RESULT_WORKERS = int(os.getenv('AZURE_JOB_RESULT_WORKERS', '4'))
+result_executor = ThreadPoolExecutor(max_workers=RESULT_WORKERS, thread_name_prefix='azure-job-results')
+
+FINAL_STATUSES = {'Succeeded', 'Failed', 'Cancelled', 'TimedOut', 'Error'}
+
+
+# Job kind -> (check_status, collect_results, list_results), rebuilt from a job's stored params
+_handlers = {}
+
+# Jobs this process is polling right now, and the claim loop thread; both are per process
+_watching = set()
+_watching_lock = threading.Lock()
+_claimer = None
+_claimer_pid = None
+
+
+class ClaimLost(Exception):
+    """Raised by a status check when another worker has taken the job over."""
+
+
+def _worker_id():
+    # Recomputed on each call so forked workers do not share the parent's identity
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _timestamp(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def register_handler(kind, check_status, collect_results, list_results=None):
+    """Tell this process how to poll jobs of one kind.
+
+    check_status(job_id, params) returns (status_json, retry_after_seconds),
+    collect_results(params) the SAS URLs of a finished job, and
+    list_results(params, page_size, continuation_token) one page of them.
+    params is the JSON-serializable dict given to register_job.
+    """
+    _handlers[kind] = (check_status, collect_results, list_results)
+
+
+def register_job(job_id, kind, params, details=None, document_bytes=None):
+    """Store a submitted batch, claimed by this worker, and hand it to the central job poller.
+
+    document_bytes sizes the first wait. Raises if the job could not be stored.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO azure_document_jobs (job_id, kind, status, params, details, document_bytes,
+                                             claimed_by, lease_expires_at)
+            VALUES (%s, %s, 'Submitted', %s::jsonb, %s::jsonb, %s, %s,
+                    (now() AT TIME ZONE 'utc') + make_interval(secs => %s));
+        """, (job_id, kind, json.dumps(params), json.dumps(details or {}), document_bytes, _worker_id(),
+              JOB_LEASE_SECONDS))
+        conn.commit()
+        cursor.close()
+
+    _watch(job_id, kind, params, document_bytes)
+    start_job_claimer()
+    logging.info(f"Registered Azure document job {job_id}.")
+    return job_id
+
+
+def _watch(job_id, kind, params, document_bytes, elapsed=0.0):
+    with _watching_lock:
+        if job_id in _watching:
+            return
+        _watching.add(job_id)
+    check_status, collect_results, _ = _handlers[kind]
+    schedule = PollSchedule(get_policy('azure'), document_bytes, elapsed)
+    future = job_poller.watch(partial(_check_job, job_id, partial(check_status, job_id, params)), schedule)
+    future.add_done_callback(partial(_job_done, job_id, partial(collect_results, params)))
+
+
+def _update_job(job_id, status, summary=None, sas_urls=None, error=None, lease_seconds=JOB_LEASE_SECONDS):
+    """Record progress on a job this worker holds; the lease is renewed, or released once it is final.
+
+    Returns False if the job is no longer claimed by this worker.
+    """
+    final = status in FINAL_STATUSES
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE azure_document_jobs
+            SET status = %s,
+                summary = COALESCE(%s::jsonb, summary),
+                sas_urls = COALESCE(%s::jsonb, sas_urls),
+                error = %s,
+                updated_at = now() AT TIME ZONE 'utc',
+                lease_expires_at = CASE WHEN %s THEN NULL
+                                        ELSE (now() AT TIME ZONE 'utc') + make_interval(secs => %s) END,
+                finished_at = CASE WHEN %s THEN now() AT TIME ZONE 'utc' END
+            WHERE job_id = %s AND claimed_by = %s AND finished_at IS NULL;
+        """, (status, json.dumps(summary) if summary is not None else None,
+              json.dumps(sas_urls) if sas_urls is not None else None, error,
+              final, lease_seconds, final, job_id, _worker_id()))
+        updated = cursor.rowcount > 0
+        conn.commit()
+        cursor.close()
+    return updated
+
+
+def _check_job(job_id, check_status):
+    """One status check for the central poller: (finished, status_json, schedule hints)."""
+    status_response, retry_after = check_status()
+    status = status_response.get('status')
+    summary = status_response.get('summary')
+
+    if status in ['Succeeded', 'Failed', 'Cancelled', 'ValidationFailed']:
+        return True, status_response, None
+
+    if not _update_job(job_id, status or 'Submitted', summary=summary):
+        raise ClaimLost(f"Job {job_id} was taken over by another worker.")
+    return False, None, {'progress': azure_progress(summary), 'retry_after': retry_after}
+
+
+def _job_done(job_id, collect_results, future):
+    # Runs on the check thread that resolved the future; collecting results can take minutes
+    result_executor.submit(_finish_and_release, job_id, collect_results, future)
+
+
+def _finish_and_release(job_id, collect_results, future):
+    try:
+        _finish_job(job_id, collect_results, future)
+    finally:
+        with _watching_lock:
+            _watching.discard(job_id)
+
+
+def _finish_job(job_id, collect_results, future):
+    try:
+        status_response = future.result()
+    except ClaimLost as e:
+        logging.info(str(e))
+        return
+    except JobTimeout:
+        logging.error(f"Translation job {job_id} timed out after {JOB_TIMEOUT} seconds.")
+        _update_job(job_id, 'TimedOut', error='Translation job did not finish in time.')
+        return
+    except Exception as e:
+        logging.error(f"Error checking translation status for job {job_id}: {str(e)}")
+        _update_job(job_id, 'Error', error=str(e))
+        return
+
+    status = status_response.get('status')
+    summary = status_response.get('summary')
+
+    if status == 'Succeeded':
+        # Hold the job long enough for the result copies, so no other worker collects it again
+        if not _update_job(job_id, 'Collecting', summary=summary, lease_seconds=JOB_COLLECT_LEASE_SECONDS):
+            logging.info(f"Job {job_id} was taken over by another worker.")
+            return
+        try:
+            sas_urls = collect_results()
+        except Exception as e:
+            logging.error(f"Failed to collect results for job {job_id}: {str(e)}")
+            _update_job(job_id, 'Error', summary=summary, error=str(e))
+            return
+        _update_job(job_id, 'Succeeded', summary=summary, sas_urls=sas_urls)
+        logging.info(f"Translation job {job_id} succeeded.")
+    else:
+        logging.error(f"Translation job failed: {status_response}")
+        _update_job(job_id, 'Failed' if status != 'Cancelled' else status,
+                    summary=summary, error=status_response.get('error') or 'Translation job failed.')
+
+
+def claim_jobs():
+    """Take over unfinished jobs nobody holds a live lease on and start polling them here.
+
+    Also drops records of jobs finished more than JOB_RETENTION seconds ago.
+    Returns the number of jobs claimed.
+    """
+    if not _handlers:
+        return 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM azure_document_jobs
+            WHERE finished_at < (now() AT TIME ZONE 'utc') - make_interval(secs => %s);
+        """, (JOB_RETENTION,))
+        cursor.execute("""
+            UPDATE azure_document_jobs
+            SET claimed_by = %s,
+                lease_expires_at = (now() AT TIME ZONE 'utc') + make_interval(secs => %s)
+            WHERE job_id IN (
+                SELECT job_id FROM azure_document_jobs
+                WHERE finished_at IS NULL
+                  AND kind = ANY(%s)
+                  AND (lease_expires_at IS NULL OR lease_expires_at < now() AT TIME ZONE 'utc')
+                ORDER BY submitted_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, kind, params, document_bytes,
+                      EXTRACT(EPOCH FROM (now() AT TIME ZONE 'utc') - submitted_at);
+        """, (_worker_id(), JOB_LEASE_SECONDS, list(_handlers), JOB_CLAIM_BATCH))
+        claimed = cursor.fetchall()
+        conn.commit()
+        cursor.close()
+
+    for job_id, kind, params, document_bytes, elapsed in claimed:
+        logging.info(f"Claimed Azure document job {job_id}.")
+        _watch(job_id, kind, params, document_bytes, float(elapsed))
+    return len(claimed)
+
+
+def _claim_loop():
+    while True:
+        try:
+            claim_jobs()
+        except Exception as e:
+            logging.error(f"Failed to claim Azure document jobs: {e}")
+        time.sleep(JOB_CLAIM_INTERVAL)
+
+
+def start_job_claimer():
+    """Start this process's claim loop once; a forked worker starts its own."""
+    global _claimer, _claimer_pid
+    with _watching_lock:
+        if _claimer is not None and _claimer_pid == os.getpid():
+            return
+        _claimer = threading.Thread(target=_claim_loop, name='azure-job-claimer', daemon=True)
+        _claimer_pid = os.getpid()
+        _claimer.start()
+
+
+def get_job(job_id):
+    """(job as shown to clients, kind, params) for a stored job, or None."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT status, summary, sas_urls, error, details, submitted_at, updated_at, kind, params
+            FROM azure_document_jobs
+            WHERE job_id = %s;
+        """, (job_id,))
+        row = cursor.fetchone()
+        cursor.close()
+    if row is None:
+        return None
+    status, summary, sas_urls, error, details, submitted_at, updated_at, kind, params = row
+    job = {
+        'job_id': job_id,
+        'status': status,
+        'submitted_at': _timestamp(submitted_at),
+        'updated_at': _timestamp(updated_at),
+        'summary': summary,
+        'sas_urls': sas_urls,
+        'error': error,
+    }
+    job.update(details or {})
+    return job, kind, params
+
+
+def get_job_status(job_id):
+    """Return the current state of a submitted Azure document job.
+
+    With a page_size query parameter the outputs are listed and signed one page at a
+    time (pass continuation_token back for the next page) instead of all at once.
+    """
+    try:
+        record = get_job(job_id)
+    except Exception as e:
+        logging.error(f"Failed to load translation job {job_id}: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+    if not record:
+        return jsonify({"message": f"No translation job found with id '{job_id}'."}), 404
+    job, kind, params = record
+
+    list_results = _handlers.get(kind, (None, None, None))[2]
+    page_size = request.args.get('page_size', type=int)
+    if page_size and list_results and job['status'] == 'Succeeded':
+        try:
+            sas_urls, continuation_token = list_results(params, min(page_size, 5000),
+                                                        request.args.get('continuation_token'))
+        except Exception as e:
+            logging.error(f"Failed to list results for job {job_id}: {str(e)}")
+            return jsonify({"message": str(e)}), 500
+        job['sas_urls'] = sas_urls
+        job['continuation_token'] = continuation_token
+    return jsonify(job), 200
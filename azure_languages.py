@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import time
+import requests
+import http_client
+
+# How long the /languages metadata is trusted before it is revalidated
+LANGUAGES_TTL = int(os.getenv('AZURE_LANGUAGES_TTL', '86400'))  # 24 hours
+
+# Process-wide registry: one entry per Translator endpoint
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _normalize(name):
+    return ' '.join(name.split()).casefold() if name else ''
+
+
+def _build_index(languages):
+    # Precompute name/nativeName -> code so lookups are a single dict access
+    index = {}
+    for code, value in (languages.get('translation') or {}).items():
+        for name in (value.get('name'), value.get('nativeName')):
+            normalized = _normalize(name)
+            if normalized:
+                index.setdefault(normalized, code)
+    return index
+
+
+def _fetch_languages(endpoint, api_key, etag=None):
+    url = f"{endpoint.rstrip('/')}/languages?api-version=3.0&scope=translation"
+    headers = {
+        'Ocp-Apim-Subscription-Key': api_key,
+        'Content-Type': 'application/json'
+    }
+    if etag:
+        headers['If-None-Match'] = etag
+    response = http_client.get(url, headers=headers)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.json(), response.headers.get('ETag')
+
+
+def _get_entry(endpoint, api_key):
+    key = endpoint.rstrip('/')
+    entry = _registry.get(key)
+    if entry and time.monotonic() - entry['fetched_at'] < LANGUAGES_TTL:
+        return entry
+
+    with _registry_lock:
+        # Another thread may have refreshed the entry while we waited
+        entry = _registry.get(key)
+        if entry and time.monotonic() - entry['fetched_at'] < LANGUAGES_TTL:
+            return entry
+
+        try:
+            languages, etag = _fetch_languages(endpoint, api_key, entry['etag'] if entry else None)
+        except requests.exceptions.RequestException as e:
+            if entry:
+                # Language metadata changes rarely, so a stale copy beats failing the request
+                logging.warning(f"Failed to revalidate supported languages, using cached copy: {str(e)}")
+                return entry
+            logging.error(f"Failed to retrieve supported languages: {str(e)}")
+            raise e
+
+        if languages is None:
+            # 304 Not Modified: keep the cached metadata and index
+            entry = dict(entry, fetched_at=time.monotonic())
+        else:
+            entry = {
+                'languages': languages,
+                'index': _build_index(languages),
+                'etag': etag,
+                'fetched_at': time.monotonic()
+            }
+        _registry[key] = entry
+        return entry
+
+
+def get_supported_languages(endpoint, api_key):
+    """Return the Translator /languages metadata, cached per endpoint."""
+    return _get_entry(endpoint, api_key)['languages']
+
+
+def get_language_code(language_name, endpoint, api_key):
+    """Convert a language name or native name to its Translator language code."""
+    if not language_name:
+        return None
+    return _get_entry(endpoint, api_key)['index'].get(_normalize(language_name))
+
+
+def clear_language_cache():
+    with _registry_lock:
+        _registry.clear()
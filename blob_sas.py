@@ -0,0 +1,66 @@
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+from urllib.parse import quote
+
+# How long generated SAS URLs stay valid
+SAS_EXPIRY_HOURS = int(os.getenv('SAS_EXPIRY_HOURS', '1'))
+
+
+@lru_cache(maxsize=32)
+def parse_connection_string(connection_string):
+    """Split a storage connection string into its Key=Value parts (parsed once per string)."""
+    parts = {}
+    for segment in connection_string.split(';'):
+        key, sep, value = segment.partition('=')
+        if sep:
+            parts[key.strip()] = value.strip()
+    return parts
+
+
+def account_url(account_name, endpoint_suffix='core.windows.net'):
+    return f"https://{account_name}.blob.{endpoint_suffix}"
+
+
+def blob_url(account_name, container_name, blob_name, sas_token=None):
+    url = f"{account_url(account_name)}/{container_name}/{quote(blob_name)}"
+    return f"{url}?{sas_token}" if sas_token else url
+
+
+def _expiry(expiry):
+    return expiry or datetime.utcnow() + timedelta(hours=SAS_EXPIRY_HOURS)
+
+
+def sign_blobs(account_name, account_key, container_name, blob_names, expiry=None):
+    """Build {blob_name: sas_url} for many blobs; all signing happens locally with the account key.
+
+    Every blob gets its own read-only SAS: the containers are shared by all jobs, so
+    a container-wide token would expose other jobs' documents.
+    """
+    from azure.storage.blob import generate_blob_sas, BlobSasPermissions  # Deferred until something is signed
+    expiry = _expiry(expiry)
+    permission = BlobSasPermissions(read=True)
+    return {
+        blob_name: blob_url(account_name, container_name, blob_name, generate_blob_sas(
+            account_name=account_name,
+            container_name=container_name,
+            blob_name=blob_name,
+            account_key=account_key,
+            permission=permission,
+            expiry=expiry
+        ))
+        for blob_name in blob_names
+    }
+
+
+def sas_url_page(container_client, account_key, prefix=None, page_size=100, continuation_token=None):
+    """List one page of blobs and sign just that page.
+
+    Returns (sas_urls, next_continuation_token); the token is None on the last page.
+    """
+    pages = container_client.list_blobs(name_starts_with=prefix, results_per_page=page_size).by_page(continuation_token)
+    page = next(pages, [])
+    blob_names = [blob.name for blob in page]
+    sas_urls = sign_blobs(container_client.account_name, account_key, container_client.container_name,
+                          blob_names)
+    return sas_urls, pages.continuation_token
@@ -0,0 +1,42 @@
+import base64
+import logging
+import os
+import uuid
+
+# Size of each staged block; memory per upload is bounded by this, not by the file size
+UPLOAD_CHUNK_SIZE = int(os.getenv('BLOB_UPLOAD_CHUNK_SIZE', str(4 * 1024 * 1024)))  # 4 MiB
+
+
+def language_blob_name(file_name, language_code):
+    """'report.pdf' -> 'report-de.pdf'; names without an extension get the code appended."""
+    stem, dot, extension = file_name.rpartition('.')
+    if not dot:
+        return f"{file_name}-{language_code}"
+    return f"{stem}-{language_code}.{extension}"
+
+
+def upload_stream(blob_client, stream, content_type=None, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Upload a file-like object as a block blob, one staged block at a time.
+
+    Only one chunk is held in memory at once. The blob becomes visible (and replaces
+    any existing blob) when the block list is committed. Returns the bytes written.
+    """
+    from azure.storage.blob import BlobBlock, ContentSettings  # Deferred until something is uploaded
+    # Block ids must be unique within the blob and all the same length
+    upload_id = uuid.uuid4().hex
+    block_list = []
+    total_bytes = 0
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        block_id = base64.b64encode(f"{upload_id}-{len(block_list):06d}".encode()).decode()
+        blob_client.stage_block(block_id=block_id, data=chunk, length=len(chunk))
+        block_list.append(BlobBlock(block_id=block_id))
+        total_bytes += len(chunk)
+
+    content_settings = ContentSettings(content_type=content_type) if content_type else None
+    blob_client.commit_block_list(block_list, content_settings=content_settings)
+    logging.info(f"Streamed {total_bytes} bytes in {len(block_list)} blocks to '{blob_client.blob_name}'.")
+    return total_bytes
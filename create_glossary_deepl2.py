@@ -1,12 +1,17 @@
-from flask import Flask, request, jsonify
-import requests
-import csv
-import io
-from io import BytesIO
+from flask import jsonify
+import http_client
+import logging
 import os
+import glossary_registry
+from glossary_parser import GlossaryValidationError, delimiter_for, parse_glossary
 
 
-app = Flask(__name__)
+class GlossaryError(Exception):
+    """DeepL refused to create a glossary; carries the response."""
+
+    def __init__(self, response):
+        super().__init__(f"Glossary creation failed with status {response.status_code}")
+        self.response = response
 
 # Language mapping as provided
 language_mapping = {
@@ -64,56 +69,46 @@ def create_glossary(source_lang, target_lang, file):
         "User-Agent": "YourApp/1.2.3"
     }
 
-    # Read and format entries from the uploaded file
-    entries = ""
-    file_extension = file.filename.split('.')[-1]
-    
-    file_contents = file.read()  # Read as bytes
-    file_io = BytesIO(file_contents)
-    
-    # Read the file based on its extension
-    if file_extension == "csv":
-        reader = csv.reader(io.TextIOWrapper(file_io, encoding="utf-8"))
-    elif file_extension == "tsv":
-        reader = csv.reader(io.TextIOWrapper(file_io, encoding="utf-8"), delimiter='\t')
-    else:
-        return {"error": "Unsupported file format. Use CSV or TSV files."}
-
-    # Process each row and create the TSV formatted string for DeepL
-    for row in reader:
-        if len(row) >= 2:
-            # Ensure each entry is formatted correctly with a tab separator
-            entries += f"{row[0]}\t{row[1]}\n"
-
-    entries = entries.strip()  # Trim the last newline
-
-    # Debugging: Inspect the entries
-    print(f"Formatted entries (TSV): {entries}")
-
-    # Define the glossary payload
-    payload = {
-        "name": glossary_name,
-        "source_lang": source_lang,
-        "target_lang": target_lang,
-        "entries": entries,
-        "entries_format": "tsv"  # Make sure the format is set as "tsv"
-    }
-
-    # Make the POST request to DeepL API
-    response = requests.post(url, headers=headers, json=payload)
-
-    # Return success or error based on the response
-    if response.status_code == 201:
-        return response.json()  # return the JSON data directly
-    else:
+    # Parse and validate the upload row by row before any call to DeepL
+    delimiter = delimiter_for(file.filename)
+    if delimiter is None:
+        return {"error": "Unsupported file format. Use CSV or TSV files.", "status_code": 400}
+    try:
+        glossary = parse_glossary(file.stream, delimiter)
+    except GlossaryValidationError as e:
+        return {"error": {"message": "Invalid glossary.", "details": e.errors}, "status_code": 400}
+    if glossary.duplicates:
+        logging.info(f"Dropped {glossary.duplicates} duplicate glossary entries.")
+
+    def create(glossary_hash):
+        # Define the glossary payload
+        payload = {
+            "name": f"{glossary_name}-{glossary_hash[:16]}",
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "entries": glossary.tsv(),
+            "entries_format": "tsv"  # Make sure the format is set as "tsv"
+        }
+
+        # Make the POST request to DeepL API
+        response = http_client.post(url, headers=headers, json=payload)
+        if response.status_code != 201:
+            raise GlossaryError(response)
+        return response.json()["glossary_id"]
+
+    # Identical entries for the same language pair reuse the glossary created earlier
+    try:
+        glossary_id, reused = glossary_registry.get_or_create(source_lang, target_lang, glossary.entries, create)
+    except GlossaryError as e:
         # Log the full response for debugging purposes
-        response_data = response.json()
-        print(f"Error response: {response_data}")
-        return {"error": response_data, "status_code": response.status_code}
+        response_data = e.response.json()
+        logging.error(f"Error response: {response_data}")
+        return {"error": response_data, "status_code": e.response.status_code}
+    return {"glossary_id": glossary_id, "reused": reused, "source_lang": source_lang, "target_lang": target_lang,
+            "entry_count": len(glossary.entries)}
 
 
 
-# @app.route('/upload_glossary', methods=['POST'])
 def upload_glossary(source_lang,target_lang,file):
 
     source_lang_code = language_mapping.get(source_lang, 'auto')
@@ -126,6 +121,3 @@ def upload_glossary(source_lang,target_lang,file):
     # Call the create_glossary function
     result = create_glossary(source_lang_code, target_lang_code, file)
     return result
-
-if __name__ == '__main__':
-    app.run(debug=True)
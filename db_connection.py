@@ -1,7 +1,13 @@
 from flask import Flask, request, jsonify
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 from psycopg2 import sql
+from contextlib import contextmanager
+import logging
 import os
+import threading
+import time
 
 # Database connection details
 
@@ -10,16 +16,158 @@ DB_CONFIG = {
     'user': os.getenv('DB_USER'),
     'password': os.getenv('DB_PASSWORD'),
     'host': os.getenv('DB_HOST'),
-    'port': os.getenv('DB_PORT')
+    'port': os.getenv('DB_PORT'),
+    'sslmode': os.getenv('DB_SSLMODE', 'require')  # Encrypted by default; override with DB_SSLMODE
 }
 
+# Pool sizing and health check configuration
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # Seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))  # Ping connections idle this long
+
+# The app's own tables are defined in schema.sql and normally provisioned with the database.
+# With DB_AUTO_MIGRATE=true each worker applies that file at startup (its role then needs CREATE rights).
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'false').lower() == 'true'
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+SCHEMA_LOCK_ID = 7204152  # Advisory lock so concurrent workers do not race on CREATE TABLE
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = None
+_last_used = {}
+_stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'discarded': 0, 'health_check_failures': 0}
+_stats_lock = threading.Lock()
+
+
 def connect_db():
-    """Create a database connection."""
+    """Create a dedicated database connection (outside the pool)."""
     conn = psycopg2.connect(
         dbname=DB_CONFIG['dbname'],
         user=DB_CONFIG['user'],
         password=DB_CONFIG['password'],
         host=DB_CONFIG['host'],
-        port=DB_CONFIG['port']
+        port=DB_CONFIG['port'],
+        sslmode=DB_CONFIG['sslmode']
     )
     return conn
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    # Connections must not be shared across a fork, so each worker process builds its own pool
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = psycopg2.pool.ThreadedConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, **DB_CONFIG)
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+            _last_used.clear()
+            logging.info(f"Database pool created (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE}).")
+        return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    # Fresh and recently used connections skip the round-trip
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_POOL_HEALTHCHECK_IDLE:
+        return True
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1;")
+        cursor.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(pool):
+    # Try a few times so one stale connection does not fail the request
+    for _ in range(DB_POOL_MAX_SIZE + 1):
+        conn = pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        _count('health_check_failures')
+        _count('discarded')
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("No healthy database connection available.")
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection; it is rolled back and returned when the block exits."""
+    pool = _get_pool()
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        _count('waits')
+        if not slots.acquire(timeout=DB_POOL_TIMEOUT):
+            _count('timeouts')
+            raise psycopg2.pool.PoolError(f"Timed out after {DB_POOL_TIMEOUT}s waiting for a database connection.")
+
+    conn = None
+    broken = False
+    try:
+        conn = _checkout(pool)
+        _count('checkouts')
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            try:
+                # Anything not committed by the caller is discarded
+                if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            discard = broken or bool(conn.closed)
+            if discard:
+                _count('discarded')
+                _last_used.pop(id(conn), None)
+            else:
+                _last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=discard)
+        slots.release()
+
+
+def apply_schema():
+    """Create any missing tables from schema.sql; every statement in it is idempotent."""
+    with open(SCHEMA_FILE) as schema_file:
+        schema = schema_file.read()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s);", (SCHEMA_LOCK_ID,))
+        cursor.execute(schema)
+        conn.commit()
+        cursor.close()
+    logging.info("Database schema is up to date.")
+
+
+def pool_stats():
+    """Current pool size and usage counters for this worker process."""
+    pool = _pool if _pool_pid == os.getpid() else None
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'in_use': len(pool._used) if pool else 0,
+        'idle': len(pool._pool) if pool else 0,
+    })
+    return stats
+
+
+def pool_stats_route():
+    return jsonify(pool_stats()), 200
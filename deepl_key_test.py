@@ -1,6 +1,5 @@
 # deepl_key_test.py
 
-import deepl
 from flask import jsonify, request
 
 def test_api_key(auth_key):
@@ -22,6 +21,7 @@ def test_api_key(auth_key):
         raise ValueError("Missing required parameter: 'auth_key'.")
 
     # Initialize the DeepL translator with the provided API key
+    import deepl
     translator = deepl.Translator(auth_key)
 
     # Get language codes from hardcoded names
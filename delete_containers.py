@@ -1,17 +1,54 @@
 import datetime
 import logging
-from azure.storage.blob import BlobServiceClient
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from flask import jsonify
 import os
+import document_cache
+import glossary_registry
+from db_connection import get_connection
+from storage_layout import SHARED_CONTAINERS, TARGET_CONTAINER, delete_prefix, expired_job_prefixes
 # Retrieve the connection string (replace with your actual environment variable if necessary)
 connection_string = os.getenv('STORAGE_CONNECTION_STRING')
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Check if the connection string is set
-if not connection_string:
-    logging.error("STORAGE_CONNECTION_STRING environment variable is not set.")
-    raise ValueError("Please set the STORAGE_CONNECTION_STRING environment variable.")
+# Cleanup configuration
+CLEANUP_MAX_AGE_SECONDS = int(os.getenv('CLEANUP_MAX_AGE_SECONDS', '900'))  # Delete anything older than 15 minutes
+# Translated outputs stay as long as job status and SAS URLs (1 hour by default) can still point at them
+CLEANUP_OUTPUT_MAX_AGE_SECONDS = int(os.getenv('CLEANUP_OUTPUT_MAX_AGE_SECONDS', '3600'))
+CLEANUP_INTERVAL_SECONDS = int(os.getenv('CLEANUP_INTERVAL_SECONDS', '300'))  # How often the scheduler runs
+CLEANUP_CONCURRENCY = int(os.getenv('CLEANUP_CONCURRENCY', '8'))  # Deletes in flight at once
+CLEANUP_TIME_BUDGET_SECONDS = int(os.getenv('CLEANUP_TIME_BUDGET_SECONDS', '120'))  # Resume next run after this
+CLEANUP_PAGE_SIZE = int(os.getenv('CLEANUP_PAGE_SIZE', '500'))
+# Legacy per-request containers are named '<prefix>YYYYMMDDHHMMSS'
+LEGACY_CONTAINER_PREFIXES = [prefix for prefix in os.getenv(
+    'CLEANUP_CONTAINER_PREFIXES', 'source-,destination-,glossary-').split(',') if prefix]
+# Advisory lock id so only one worker process runs a cleanup at a time
+CLEANUP_LOCK_ID = 7204151
+
+_run_lock = threading.Lock()
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+# Continuation token per container prefix, kept when a run stops on its time budget
+_resume_tokens = {}
+_metrics = {
+    'runs_total': 0,
+    'last_run_started_at': None,
+    'last_run_duration_seconds': None,
+    'last_run_deleted': 0,
+    'deleted_containers_total': 0,
+    'deleted_prefixes_total': 0,
+    'cache_evicted_total': 0,
+    'glossaries_deleted_total': 0,
+    'errors_total': 0,
+    'lag_seconds': 0,
+    'resume_pending': False,
+}
+_metrics_lock = threading.Lock()
+
 
 def get_container_timestamp(container_name):
     # Extract timestamp from container name, assuming format 'source-YYYYMMDDHHMMSS'
@@ -21,41 +58,244 @@ def get_container_timestamp(container_name):
     except ValueError:
         return None
 
-def delete_old_containers():
-    logging.info("Flask App to delete containers created over an hour ago")
 
-    # Create BlobServiceClient using the connection string
+def _record(**changes):
+    with _metrics_lock:
+        for key, value in changes.items():
+            if key.endswith('_total'):
+                _metrics[key] += value
+            else:
+                _metrics[key] = value
+
+
+def _delete_container(blob_service_client, container_name):
+    from azure.core.exceptions import ResourceNotFoundError
+    try:
+        blob_service_client.delete_container(container_name)
+        logging.info(f"Deleted container: {container_name}")
+        return True
+    except ResourceNotFoundError:
+        # Another worker got there first
+        return False
+
+
+def _delete_job_prefix(container_client, prefix):
+    deleted_blobs = delete_prefix(container_client, prefix)
+    logging.info(f"Deleted {deleted_blobs} blobs under {container_client.container_name}/{prefix}")
+    return True
+
+
+def _collect_expired_containers(blob_service_client, cutoff, deadline):
+    """List legacy containers page by page with a server-side prefix filter."""
+    expired = []
+    oldest = None
+    for name_prefix in LEGACY_CONTAINER_PREFIXES:
+        pages = blob_service_client.list_containers(
+            name_starts_with=name_prefix, results_per_page=CLEANUP_PAGE_SIZE
+        ).by_page(continuation_token=_resume_tokens.get(name_prefix))
+        for page in pages:
+            for container in page:
+                container_timestamp = get_container_timestamp(container['name'])
+                if container_timestamp and container_timestamp < cutoff:
+                    expired.append(container['name'])
+                    oldest = min(oldest or container_timestamp, container_timestamp)
+            if time.monotonic() > deadline and pages.continuation_token:
+                # Out of time: remember where we stopped and pick up there next run
+                _resume_tokens[name_prefix] = pages.continuation_token
+                break
+        else:
+            _resume_tokens.pop(name_prefix, None)
+    return expired, oldest
+
+
+def _release_cluster_lock(conn, cursor):
+    # Session-level lock: release it before the connection goes back to the pool
+    try:
+        cursor.execute("SELECT pg_advisory_unlock(%s);", (CLEANUP_LOCK_ID,))
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Failed to release cleanup lock, discarding the connection: {e}")
+        # The session may still hold the lock; closing it drops the lock and keeps it out of the pool
+        cursor.close()
+        conn.close()
+
+
+@contextmanager
+def _cluster_lock():
+    """Advisory lock so only one worker process cleans up at a time; yields whether we hold it."""
+    with ExitStack() as stack:
+        try:
+            conn = stack.enter_context(get_connection())
+        except Exception as e:
+            # If the database is unavailable, run anyway; duplicate deletes are harmless
+            logging.warning(f"Cleanup lock unavailable, running without coordination: {e}")
+            conn = None
+        if conn is None:
+            yield True
+            return
+
+        cursor = conn.cursor()
+        stack.callback(cursor.close)
+        cursor.execute("SELECT pg_try_advisory_lock(%s);", (CLEANUP_LOCK_ID,))
+        acquired = cursor.fetchone()[0]
+        conn.commit()
+        if acquired:
+            stack.callback(_release_cluster_lock, conn, cursor)
+        yield acquired
+
+
+def run_cleanup():
+    """One cleanup pass over legacy containers and expired job prefixes; returns a summary."""
+    if not connection_string:
+        logging.error("STORAGE_CONNECTION_STRING environment variable is not set.")
+        return {"error": "Please set the STORAGE_CONNECTION_STRING environment variable."}
+    if not _run_lock.acquire(blocking=False):
+        return {"skipped": "A cleanup run is already in progress."}
+
+    try:
+        with _cluster_lock() as acquired:
+            if not acquired:
+                return {"skipped": "Another worker is running the cleanup."}
+            started = time.monotonic()
+            return _run_cleanup(started, started + CLEANUP_TIME_BUDGET_SECONDS)
+    finally:
+        _run_lock.release()
+
+
+def _tenant_blob_clients():
+    """Clients for the storage accounts in the Azure settings; Azure results are cached there."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT storage_connection_string FROM settings
+            WHERE storage_connection_string IS NOT NULL AND storage_connection_string <> '';
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+
+    from azure.storage.blob import BlobServiceClient
+    clients = []
+    for (tenant_connection_string,) in rows:
+        try:
+            clients.append(BlobServiceClient.from_connection_string(tenant_connection_string))
+        except ValueError as e:
+            logging.error(f"Skipping an invalid storage connection string in the settings: {e}")
+    return clients
+
+
+def _run_cleanup(started, deadline):
+    # The SDK is imported on the first run, not when the app imports this module
+    from azure.core.exceptions import ResourceNotFoundError
+    from azure.storage.blob import BlobServiceClient
     blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    
-    # Get current time
     current_time = datetime.datetime.utcnow()
-    logging.info(f"Current UTC Time: {current_time}")
+    cutoff = current_time - datetime.timedelta(seconds=CLEANUP_MAX_AGE_SECONDS)
+    logging.info(f"Deleting containers and job prefixes older than {CLEANUP_MAX_AGE_SECONDS} seconds (before {cutoff})")
+    _record(last_run_started_at=current_time.isoformat() + 'Z')
+
+    errors = 0
+    expired_containers, oldest = _collect_expired_containers(blob_service_client, cutoff, deadline)
 
-    # List all containers in the storage account
-    containers = blob_service_client.list_containers()
+    expired_prefixes = []
+    output_cutoff = current_time - datetime.timedelta(seconds=max(CLEANUP_OUTPUT_MAX_AGE_SECONDS,
+                                                                  CLEANUP_MAX_AGE_SECONDS))
+    for shared_container in SHARED_CONTAINERS:
+        container_client = blob_service_client.get_container_client(shared_container)
+        container_cutoff = output_cutoff if shared_container == TARGET_CONTAINER else cutoff
+        try:
+            for prefix, modified in expired_job_prefixes(container_client, container_cutoff):
+                expired_prefixes.append((container_client, prefix))
+                # Lag is reported against the general cutoff, so shift by this container's extra retention
+                waiting_since = modified + (cutoff - container_cutoff)
+                oldest = min(oldest or waiting_since, waiting_since)
+        except ResourceNotFoundError:
+            continue
+        except Exception as e:
+            errors += 1
+            logging.error(f"Failed to list job prefixes in container {shared_container}: {e}")
 
     deleted_containers = []
+    deleted_prefixes = []
+    with ThreadPoolExecutor(max_workers=CLEANUP_CONCURRENCY, thread_name_prefix='cleanup') as executor:
+        container_futures = {executor.submit(_delete_container, blob_service_client, name): name
+                             for name in expired_containers}
+        prefix_futures = {executor.submit(_delete_job_prefix, client, prefix): f"{client.container_name}/{prefix}"
+                          for client, prefix in expired_prefixes}
+        for futures, deleted in ((container_futures, deleted_containers), (prefix_futures, deleted_prefixes)):
+            for future, name in futures.items():
+                try:
+                    if future.result():
+                        deleted.append(name)
+                except Exception as e:
+                    errors += 1
+                    logging.error(f"Failed to delete {name}: {e}")
 
-    for container in containers:
-        container_name = container['name']
+    # Age/size eviction of the document result cache rides along with the cleanup
+    evicted = 0
+    try:
+        # Each entry is deleted in the account it was cached in: ours for DeepL, the tenant's for Azure
+        evicted = document_cache.evict([blob_service_client] + _tenant_blob_clients())
+    except Exception as e:
+        errors += 1
+        logging.error(f"Failed to evict document cache entries: {e}")
 
-        # Get the timestamp from the container name
-        container_timestamp = get_container_timestamp(container_name)
+    # DeepL glossaries nobody has reused for a while
+    glossaries_deleted = 0
+    try:
+        glossaries_deleted = glossary_registry.collect_garbage()
+    except Exception as e:
+        errors += 1
+        logging.error(f"Failed to collect unused DeepL glossaries: {e}")
+
+    # Lag: how long the oldest expired item had been waiting past its expiry
+    lag = (cutoff - oldest).total_seconds() if oldest else 0
+    duration = time.monotonic() - started
+    _record(
+        runs_total=1,
+        last_run_duration_seconds=round(duration, 3),
+        last_run_deleted=len(deleted_containers) + len(deleted_prefixes),
+        deleted_containers_total=len(deleted_containers),
+        deleted_prefixes_total=len(deleted_prefixes),
+        cache_evicted_total=evicted,
+        glossaries_deleted_total=glossaries_deleted,
+        errors_total=errors,
+        lag_seconds=round(lag, 3),
+        resume_pending=bool(_resume_tokens),
+    )
+    return {"deleted_containers": deleted_containers, "deleted_prefixes": deleted_prefixes,
+            "cache_evicted": evicted, "glossaries_deleted": glossaries_deleted, "errors": errors}
+
+
+def cleanup_metrics():
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def _cleanup_forever():
+    while True:
+        try:
+            run_cleanup()
+        except Exception as e:
+            _record(errors_total=1)
+            logging.error(f"Scheduled cleanup failed: {e}")
+        # Resume straight away when the last run stopped on its time budget
+        time.sleep(1 if _resume_tokens else CLEANUP_INTERVAL_SECONDS)
+
+
+def start_cleanup_scheduler():
+    """Run the cleanup in a background thread every CLEANUP_INTERVAL_SECONDS."""
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_thread = threading.Thread(target=_cleanup_forever, name='container-cleanup', daemon=True)
+            _scheduler_thread.start()
+
+
+def delete_old_containers():
+    # The run happens in the background; the HTTP call no longer waits for it
+    threading.Thread(target=run_cleanup, name='container-cleanup-manual', daemon=True).start()
+    return jsonify({"message": "Cleanup started.", "metrics": cleanup_metrics()}), 202
 
-        if container_timestamp:
-            # Check if the container is older than one hour
-            time_difference = current_time - container_timestamp
-            if time_difference.total_seconds() > 900:  # Older than 15 minutes
-                try:
-                    # Delete the container
-                    blob_service_client.delete_container(container_name)
-                    deleted_containers.append(container_name)
-                    logging.info(f"Deleted container: {container_name}")
-                except Exception as e:
-                    logging.error(f"Failed to delete container {container_name}: {e}")
-            else:
-                logging.info(f"Container {container_name} is less than 1 hour old, skipping...")
-        else:
-            logging.info(f"Container {container_name} does not match the expected naming pattern.")
 
-    return jsonify({"deleted_containers": deleted_containers}), 200
+def cleanup_metrics_route():
+    return jsonify(cleanup_metrics()), 200
@@ -1,30 +1,39 @@
 import logging
 import json
 import requests
-from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
-from flask import Flask, request, jsonify
-import time
+import hashlib
+import http_client
+import document_cache
+from flask import request, jsonify
 import psycopg2
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from azure_jobs import register_handler, register_job
+import azure_languages
+from blob_uploads import language_blob_name, upload_stream
+from form_fields import parse_target_languages
+from storage_layout import GLOSSARY_CONTAINER, SOURCE_CONTAINER, TARGET_CONTAINER, ensure_shared_containers, new_job_prefix
+from blob_sas import account_url, parse_connection_string, sas_url_page, sign_blobs
+from settings_cache import get_azure_settings
+from polling_policy import retry_after_seconds
 
 
 
-# Setup Flask app
-app = Flask(__name__)
-
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
-# Global variables
-connection_string = None
-api_key = None
-endpoint = None
-document_translation_endpoint = None
-blob_service_client = None
-base_path = None
-account_name = None
-account_key = None
+# Upper bound on blob uploads running at the same time in this worker
+MAX_CONCURRENT_UPLOADS = int(os.getenv('AZURE_MAX_CONCURRENT_UPLOADS', '8'))
+upload_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_UPLOADS, thread_name_prefix='azure-upload')
+
+# One BlobServiceClient per connection string, shared by every job in this process
+_blob_clients = {}
+_blob_clients_lock = threading.Lock()
+
+# Content-addressed glossaries live outside the dated job prefixes, so cleanup leaves them alone
+GLOSSARY_PREFIX = 'glossaries/'
+_stored_glossaries = set()  # (account, container, blob name) of glossaries known to exist
 
 # Hardcoded Admin ID
 admin_id = '1'
@@ -32,329 +41,449 @@ admin_id = '1'
 # full_url = f"{retrieve_settings_url}?admin_id={admin_id}"
 
 
-def get_settings():
-    global connection_string, api_key, endpoint, document_translation_endpoint, blob_service_client, base_path
-    try:
-        # Database connection details
-        host = os.getenv('DB_HOST')
-        database = os.getenv('DB_NAME')
-        user = os.getenv('DB_USER')
-        password = os.getenv('DB_PASSWORD')
-        port = os.getenv('DB_PORT')
-
-        # Establish connection to PostgreSQL
-        conn = psycopg2.connect(
-            host=host,
-            database=database,
-            user=user,
-            password=password,
-            port=port,
-            sslmode='require'  # Ensure secure connection with Cosmos DB for PostgreSQL
-        )
+class AzureJobContext:
+    """Everything one document job needs: credentials, clients, containers and its prefix.
 
-        # Create a cursor object to interact with the database
-        cursor = conn.cursor()
-
-        # SQL query to fetch settings for the given admin_id
-        query = """
-        SELECT key, text_translation_endpoint, document_translation_endpoint, region, storage_connection_string
-        FROM settings
-        WHERE admin_id = %s;
-        """
-        cursor.execute(query, (admin_id,))
-        result = cursor.fetchone()
-
-        # Check if result is found
-        if result:
-            api_key, endpoint, document_translation_endpoint, region, connection_string = result
-            base_path = f"{document_translation_endpoint}/translator/document/batches"
-
-            # Check if all necessary settings were retrieved
-            if not all([connection_string, api_key, endpoint, document_translation_endpoint, base_path]):
-                logging.error("Missing required settings.")
-                return False
-
-            # Initialize BlobServiceClient
-            blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-            logging.info("Settings retrieved and blob client initialized.")
-            return True
-        else:
-            logging.error("No settings found for the specified admin_id.")
-            return False
+    Built fresh for each request and passed down explicitly, so concurrent requests
+    on threaded or async workers never see each other's settings or job prefix.
+    """
 
-    except psycopg2.Error as e:
-        logging.error(f"Database error: {e}")
-        return False
-    finally:
-        # Close the cursor and connection
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+    def __init__(self, settings, blob_service_client, job_prefix=None):
+        self.api_key = settings['key']
+        self.endpoint = settings['text_translation_endpoint']
+        self.document_translation_endpoint = settings['document_translation_endpoint']
+        self.connection_string = settings['storage_connection_string']
+        self.blob_service_client = blob_service_client
 
+        details = parse_connection_string(self.connection_string)
+        self.account_name = details.get('AccountName')
+        self.account_key = details.get('AccountKey')
 
-def parse_storage_account_details():
-    global account_name, account_key, connection_string
-    try:
-        account_name_start = connection_string.find("AccountName=") + len("AccountName=")
-        account_name_end = connection_string.find(";", account_name_start)
-        account_key_start = connection_string.find("AccountKey=") + len("AccountKey=")
-        account_key_end = connection_string.find(";", account_key_start)
+        # Long-lived shared containers; each job gets its own virtual directory in them
+        self.source_container_name = SOURCE_CONTAINER
+        self.target_container_name = TARGET_CONTAINER
+        self.glossary_container_name = GLOSSARY_CONTAINER
+        self.job_prefix = job_prefix or new_job_prefix()
 
-        account_name = connection_string[account_name_start:account_name_end]
-        account_key = connection_string[account_key_start:account_key_end]
+    def container_url(self, container_name):
+        return f"https://{self.account_name}.blob.core.windows.net/{container_name}"
 
-        logging.info(f"Storage account name extracted: {account_name}")
-        logging.info("Storage account key extracted.")
-    except Exception as ex:
-        logging.error(f"Failed to parse storage account details: {ex}")
 
+def _get_blob_service_client(connection_string):
+    # Clients are thread-safe and keep their own connection pool, so one per storage account is shared
+    with _blob_clients_lock:
+        client = _blob_clients.get(connection_string)
+        if client is None:
+            from azure.storage.blob import BlobServiceClient  # Deferred so importing this module stays cheap
+            client = _blob_clients[connection_string] = BlobServiceClient.from_connection_string(connection_string)
+        return client
 
 
-# Assuming blob_service_client is defined globally elsewhere in your code
-# If not, you might want to initialize it within these functions or pass it as a parameter.
+def create_job_context(job_prefix=None):
+    """Load the settings and set up storage for one job; returns an AzureJobContext or None.
 
-def create_container(container_name):
+    Pass the prefix of an existing job to rebuild its context, e.g. on another worker.
+    """
     try:
-        container_client = blob_service_client.create_container(container_name)
-        logging.info(f"Container '{container_name}' created successfully.")
-        return container_name
-    except Exception as ex:
-        logging.error(f"An error occurred while creating the container '{container_name}': {ex}")
-        return str(ex)
+        # Settings row is served from the in-process cache, invalidated by save_settings
+        settings = get_azure_settings(admin_id)
+    except psycopg2.Error as e:
+        logging.error(f"Database error: {e}")
+        return None
 
-def generate_container_names():
-    global source_container_name, target_container_name, glossary_container_name
+    if not settings:
+        logging.error("No settings found for the specified admin_id.")
+        return None
 
-    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-    
-    source_container_name = f"source-{timestamp}"
-    target_container_name = f"destination-{timestamp}"
-    glossary_container_name = f"glossary-{timestamp}"
+    # Check if all necessary settings were retrieved
+    if not all([settings['storage_connection_string'], settings['key'], settings['text_translation_endpoint'],
+                settings['document_translation_endpoint']]):
+        logging.error("Missing required settings.")
+        return None
 
-    # Create containers
-    create_container(source_container_name)
-    create_container(target_container_name)
-    create_container(glossary_container_name)
+    try:
+        context = AzureJobContext(settings, _get_blob_service_client(settings['storage_connection_string']),
+                                  job_prefix)
+    except Exception as ex:
+        logging.error(f"Failed to set up storage for the job: {ex}")
+        return None
+    logging.info(f"Storage account name extracted: {context.account_name}")
 
-def upload_blob(file_name, file_content, container_name, target_language_code):
+    # Only the first request in this process pays for the create calls
+    ensure_shared_containers(context.blob_service_client)
+    return context
+
+def upload_blob(context, file_name, file_stream, container_name, target_language_code, content_type=None, prefix=''):
     try:
-        # Modify the file name to include the target language code
-        modified_file_name = f"{file_name.rsplit('.', 1)[0]}-{target_language_code}.{file_name.rsplit('.', 1)[1]}"
+        # Modify the file name to include the target language code (if any), under the job's prefix
+        modified_file_name = prefix + (language_blob_name(file_name, target_language_code)
+                                       if target_language_code else file_name)
 
         # Get container and blob clients
-        container_client = blob_service_client.get_container_client(container_name)
+        container_client = context.blob_service_client.get_container_client(container_name)
         blob_client = container_client.get_blob_client(modified_file_name)
 
-        # Upload the blob
-        blob_client.upload_blob(file_content, overwrite=True)
+        # Stream the upload in blocks instead of reading the whole file into memory
+        upload_stream(blob_client, file_stream, content_type)
         logging.info(f"File '{modified_file_name}' uploaded to container '{container_name}' successfully.")
         return f"File '{modified_file_name}' uploaded successfully."
     except Exception as ex:
         logging.error(f"An error occurred: {ex}")
-        return str(ex)
+        raise
 
-def upload_blob2(file_name, file_content, container_name):
+def upload_blob2(context, file_name, file_stream, container_name):
     try:
-        container_client = blob_service_client.get_container_client(container_name)
+        container_client = context.blob_service_client.get_container_client(container_name)
         blob_client = container_client.get_blob_client(file_name)
-        blob_client.upload_blob(file_content, overwrite=True)
+        upload_stream(blob_client, file_stream)
         logging.info(f"File '{file_name}' uploaded to container '{container_name}' successfully.")
         return f"File '{file_name}' uploaded successfully."
     except Exception as ex:
         logging.error(f"An error occurred: {ex}")
-        return str(ex)
+        raise
+
+def glossary_blob_name(file_name, digest):
+    """Content-addressed name for a glossary: 'glossaries/<sha256>.<csv|tsv>'."""
+    extension = 'tsv' if file_name.lower().endswith('.tsv') else 'csv'  # Default to CSV
+    return f"{GLOSSARY_PREFIX}{digest}.{extension}"
+
+def upload_glossary_blob(context, blob_name, file_stream, container_name):
+    # Same content, same name: a glossary already in storage is never uploaded again
+    key = (context.account_name, container_name, blob_name)
+    if key in _stored_glossaries:
+        return f"Glossary '{blob_name}' already stored."
+    blob_client = context.blob_service_client.get_container_client(container_name).get_blob_client(blob_name)
+    if blob_client.exists():
+        _stored_glossaries.add(key)
+        return f"Glossary '{blob_name}' already stored."
+    message = upload_blob2(context, blob_name, file_stream, container_name)
+    _stored_glossaries.add(key)
+    return message
+
+def upload_all(uploads):
+    """Run (file_name, upload_function, args) uploads concurrently and stop at the first failure.
+
+    Returns (ok, results) where results has one entry per upload, in input order.
+    """
+    futures = [upload_executor.submit(function, *args) for _, function, args in uploads]
+    ok = True
+    for future in as_completed(futures):
+        if future.exception() is not None:
+            ok = False
+            # Fail fast: uploads that have not started yet are dropped
+            for pending in futures:
+                pending.cancel()
+            break
+    # Wait for the ones already running so nothing writes after we answer
+    wait(futures)
 
-# The above functions can be called in your main function or route handler as needed.
+    results = []
+    for (file_name, _, _), future in zip(uploads, futures):
+        if future.cancelled():
+            results.append({'file_name': file_name, 'status': 'cancelled'})
+        elif future.exception() is not None:
+            results.append({'file_name': file_name, 'status': 'failed', 'message': str(future.exception())})
+        else:
+            results.append({'file_name': file_name, 'status': 'uploaded', 'message': future.result()})
+    return ok, results
 
+# The above functions can be called in your main function or route handler as needed.
 
 
 
-# Assuming api_key, endpoint, and document_translation_endpoint are defined globally elsewhere in your code
 
-def get_supported_languages():
-    try:
-        url = f"{endpoint}languages?api-version=3.0"
-        headers = {
-            'Ocp-Apim-Subscription-Key': api_key,
-            'Content-Type': 'application/json'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to retrieve supported languages: {str(e)}")
-        raise e
+def get_supported_languages(context):
+    # Served from the process-wide language registry, refreshed on a TTL
+    return azure_languages.get_supported_languages(context.endpoint, context.api_key)
 
-def get_language_code(language_name):
-    languages = get_supported_languages()
-    if 'translation' in languages:
-        for key, value in languages['translation'].items():
-            if value['name'].lower() == language_name.lower() or value['nativeName'].lower() == language_name.lower():
-                return key
-    return None
+def get_language_code(context, language_name):
+    return azure_languages.get_language_code(language_name, context.endpoint, context.api_key)
 
 def generate_sas_url(account_name, account_key, container_name, blob_name):
-    blob_service_client = BlobServiceClient(
-        account_url=f"https://{account_name}.blob.core.windows.net",
-        credential=account_key
-    )
-    sas_expiry = datetime.utcnow() + timedelta(hours=1)
-    sas_token = generate_blob_sas(
-        account_name=account_name,
-        container_name=container_name,
-        blob_name=blob_name,
-        account_key=account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=sas_expiry
-    )
-    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-    sas_url = f"{blob_client.url}?{sas_token}"
-    return sas_url
+    # Signed locally with the account key; no client is needed just to format a URL
+    return sign_blobs(account_name, account_key, container_name, [blob_name])[blob_name]
 
-def get_blob_sas_urls(account_name, account_key, container_name):
-    blob_service_client = BlobServiceClient(
-        account_url=f"https://{account_name}.blob.core.windows.net",
+def _container_client(account_name, account_key, container_name):
+    from azure.storage.blob import ContainerClient
+    return ContainerClient(
+        account_url=account_url(account_name),
+        container_name=container_name,
         credential=account_key
     )
-    container_client = blob_service_client.get_container_client(container_name)
-    sas_urls = {}
+
+def get_blob_sas_urls(account_name, account_key, container_name, prefix=None):
+    container_client = _container_client(account_name, account_key, container_name)
     try:
-        for blob in container_client.list_blobs():
-            blob_name = blob.name
-            sas_url = generate_sas_url(account_name, account_key, container_name, blob_name)
-            sas_urls[blob_name] = sas_url
-        logging.info(f"Generated SAS URLs: {sas_urls}")
+        blob_names = [blob.name for blob in container_client.list_blobs(name_starts_with=prefix)]
+        sas_urls = sign_blobs(account_name, account_key, container_name, blob_names)
+        logging.info(f"Generated {len(sas_urls)} SAS URLs for container '{container_name}'.")
     except Exception as e:
         logging.error(f"An error occurred while generating SAS URLs: {e}")
         raise e
     return sas_urls
 
-def check_translation_status(job_id):
-    url = f"{document_translation_endpoint}translator/document/batches/{job_id}?api-version=2024-05-01"
+def get_blob_sas_url_page(account_name, account_key, container_name, page_size, continuation_token=None, prefix=None):
+    # Lazy listing for jobs with many outputs: only one page is listed and signed per call
+    container_client = _container_client(account_name, account_key, container_name)
+    return sas_url_page(container_client, account_key, prefix, page_size, continuation_token)
+
+def group_by_language(sas_urls, prefix):
+    """{blob_name: url} under '<prefix><code>/...' -> {code: {blob_name: url}}."""
+    grouped = {}
+    for blob_name, url in sas_urls.items():
+        code = blob_name[len(prefix):].split('/', 1)[0]
+        grouped.setdefault(code, {})[blob_name] = url
+    return grouped
+
+def get_language_sas_urls(account_name, account_key, container_name, prefix):
+    # One listing for the whole job, then split by the per-language output prefix
+    return group_by_language(get_blob_sas_urls(account_name, account_key, container_name, prefix), prefix)
+
+def collect_and_cache_results(account_name, account_key, container_name, prefix, blob_client,
+                              source_language_code, cache_keys):
+    """Sign a finished job's outputs and copy each one into the document result cache."""
+    container_client = _container_client(account_name, account_key, container_name)
+    # One listing gives the names to sign and the sizes that pick the copy mode
+    sizes = {blob.name: blob.size for blob in container_client.list_blobs(name_starts_with=prefix)}
+    grouped = group_by_language(sign_blobs(account_name, account_key, container_name, list(sizes)), prefix)
+    for code, sas_urls in grouped.items():
+        for blob_name, sas_url in sas_urls.items():
+            file_name = blob_name.rsplit('/', 1)[-1]
+            cache_key = cache_keys.get((code, file_name))
+            if cache_key:
+                document_cache.store(blob_client, cache_key, 'azure', source_language_code, code, file_name, sas_url,
+                                     sizes[blob_name])
+    return grouped
+
+def get_language_sas_url_page(account_name, account_key, container_name, prefix, page_size, continuation_token=None):
+    sas_urls, continuation_token = get_blob_sas_url_page(
+        account_name, account_key, container_name, page_size, continuation_token, prefix=prefix)
+    return group_by_language(sas_urls, prefix), continuation_token
+
+def glossaries_by_target(uploads, target_language_codes):
+    """{target code: [glossary files]} from the request's files.
+
+    Glossaries are tied to a language pair, so with several targets each one is sent
+    as glossary_file_<target> (the language name or its code), repeated for more than
+    one glossary. Plain glossary_file fields are only accepted for a single target.
+    Raises ValueError otherwise.
+    """
+    target_codes = list(dict.fromkeys(target_language_codes.values()))
+    codes_by_lower = {code.lower(): code for code in target_codes}
+    glossaries = {}
+    for field in uploads:
+        if field == 'glossary_file':
+            if len(target_codes) > 1:
+                raise ValueError("glossary_file applies to a single target language; "
+                                 "send glossary_file_<target_language> for each target instead.")
+            code = target_codes[0]
+        elif field.startswith('glossary_file_'):
+            target = field[len('glossary_file_'):]
+            code = target_language_codes.get(target) or codes_by_lower.get(target.lower())
+            if not code:
+                raise ValueError(f"'{field}' does not match any requested target language.")
+        else:
+            continue
+        glossaries.setdefault(code, []).extend(upload for upload in uploads.getlist(field) if upload.filename)
+    return {code: files for code, files in glossaries.items() if files}
+
+def check_translation_status(job_id, translation_endpoint, subscription_key):
+    """Batch status JSON plus any Retry-After the service asked for."""
+    url = f"{translation_endpoint}translator/document/batches/{job_id}?api-version=2024-05-01"
     headers = {
-        'Ocp-Apim-Subscription-Key': api_key,
+        'Ocp-Apim-Subscription-Key': subscription_key,
     }
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=headers)
     response.raise_for_status()
-    return response.json()
+    return response.json(), retry_after_seconds(response)
 
-# The above functions can be called in your main function or route handler as needed.
+def _stored_job_context(params):
+    context = create_job_context(params['job_prefix'])
+    if context is None:
+        raise RuntimeError("Failed to retrieve settings.")
+    return context
+
+def check_stored_job(job_id, params):
+    context = _stored_job_context(params)
+    return check_translation_status(job_id, context.document_translation_endpoint, context.api_key)
+
+def collect_stored_job(params):
+    context = _stored_job_context(params)
+    cache_keys = {(code, file_name): cache_key for code, file_name, cache_key in params['cache_keys']}
+    return collect_and_cache_results(context.account_name, context.account_key, params['target_container_name'],
+                                     params['job_prefix'], context.blob_service_client,
+                                     params['source_language_code'], cache_keys)
 
+def list_stored_job(params, page_size, continuation_token=None):
+    context = _stored_job_context(params)
+    return get_language_sas_url_page(context.account_name, context.account_key, params['target_container_name'],
+                                     params['job_prefix'], page_size, continuation_token)
+
+# Any worker can poll or list a stored job: its context is rebuilt from the settings and the stored prefix
+register_handler('document_translation', check_stored_job, collect_stored_job, list_stored_job)
+
+# The above functions can be called in your main function or route handler as needed.
 
 
-# Assuming api_key, endpoint, document_translation_endpoint, account_name,
-# source_container_name, target_container_name, glossary_container_name are defined globally
 
-@app.route('/docu_trans_azure2', methods=['POST'])
 def docu_trans_azure2():
     logging.info('Processing HTTP request.')
 
-    # Ensure settings are retrieved
-    if not get_settings():
+    # Settings, clients, shared containers and a unique prefix for this job only
+    context = create_job_context()
+    if context is None:
         return jsonify({"message": "Failed to retrieve settings."}), 500
 
-    # Parse the storage account details
-    parse_storage_account_details()
-
-    generate_container_names()  # Dynamically create new containers
-
     source_language_name = request.form.get('source_language')
-    target_language_name = request.form.get('target_language')
-
+    target_language_names = parse_target_languages(request.form.getlist('target_language'))
 
-    if not source_language_name or not target_language_name:
+    if not source_language_name or not target_language_names:
         return jsonify({"message": "Please provide both source_language and target_language in the request."}), 400
 
-    source_language_code = get_language_code(source_language_name)
-    target_language_code = get_language_code(target_language_name)
+    source_language_code = get_language_code(context, source_language_name)
+    target_language_codes = {name: get_language_code(context, name) for name in target_language_names}
+    unsupported = [name for name, code in target_language_codes.items() if not code]
 
-    if not source_language_code or not target_language_code:
-        return jsonify({"message": "One or both languages are not supported."}), 404
+    if not source_language_code or unsupported:
+        return jsonify({"message": "One or more languages are not supported.", "unsupported": unsupported}), 404
+
+    # Several names can resolve to the same code; translate into each code once
+    target_codes = list(dict.fromkeys(target_language_codes.values()))
 
     if 'file' not in request.files and 'glossary_file' not in request.files:
         return jsonify({"message": "No files part in the request."}), 400
 
     files = request.files.getlist('file')
-    glossary_files = request.files.getlist('glossary_file')
-
-    results = []
+    try:
+        glossary_files = glossaries_by_target(request.files, target_language_codes)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # A single target keeps the language-suffixed name; with several the source is shared by all of them
+    source_name_code = target_codes[0] if len(target_codes) == 1 else None
+
+    # Documents already translated with the same bytes, languages and glossaries are served from the result cache
+    glossary_blobs = {}  # target code -> content-addressed blob names of its glossaries
+    glossary_streams = {}  # blob name -> a stream with that content, uploaded once however many targets use it
+    glossary_hashes = {}
+    for code, uploads in glossary_files.items():
+        digests = [document_cache.file_digest(upload.stream) for upload in uploads]
+        glossary_blobs[code] = [glossary_blob_name(upload.filename, digest) for upload, digest in zip(uploads, digests)]
+        for upload, blob_name in zip(uploads, glossary_blobs[code]):
+            glossary_streams.setdefault(blob_name, upload)
+        glossary_hashes[code] = hashlib.sha256(''.join(digests).encode()).hexdigest()
+    bypass_cache = document_cache.bypass_requested(request.form)
+    cached = {code: {} for code in target_codes}
+    cache_keys = {}  # (language code, source blob file name) -> cache key, for storing the outputs later
+    pending = {}  # tuple of target codes still missing -> files missing exactly those
     for file in files:
-        file_content = file.read()
-        
-        # Call the upload_blob function with the target language code
-        result = upload_blob(file.filename, file_content, source_container_name, target_language_code)
-        results.append(result)
-
-    # Handle glossary file uploads
-    if glossary_files:
-        for glossary_file in glossary_files:
-            glossary_content = glossary_file.read()
-            result = upload_blob2("glossary.csv", glossary_content, glossary_container_name)
-            results.append(result)
-
-        # Detect the glossary format based on file extension
-        glossary_file_extension = "csv"  # Default to CSV
-        if glossary_files[0].filename.endswith('.tsv'):
-            glossary_file_extension = "tsv"
-        elif glossary_files[0].filename.endswith('.csv'):
-            glossary_file_extension = "csv"
-
-    base_path = f"{document_translation_endpoint}translator/document/batches"
+        file_sha256 = document_cache.file_digest(file.stream)
+        source_file_name = language_blob_name(file.filename, source_name_code) if source_name_code else file.filename
+        missing = []
+        for code in target_codes:
+            cache_key = document_cache.make_key(file_sha256, 'azure', source_language_code, code,
+                                                glossary_hash=glossary_hashes.get(code))
+            hit = None if bypass_cache else document_cache.lookup(cache_key, context.account_name)
+            if hit:
+                cached[code][hit['blob_name']] = hit
+            else:
+                missing.append(code)
+            cache_keys[(code, source_file_name)] = cache_key
+        if missing:
+            pending.setdefault(tuple(missing), []).append(file)
+
+    cached = {code: sign_blobs(context.account_name, context.account_key, document_cache.DOC_CACHE_CONTAINER, list(hits))
+              for code, hits in cached.items()}
+    if not pending:
+        # Every document/language pair was a cache hit: no vendor job at all
+        return jsonify({
+            'status': 'Succeeded',
+            'sas_urls': cached,
+            'cached': cached,
+            'target_languages': target_codes
+        }), 200
+
+    # Documents missing the same targets share one batch input under its own source prefix,
+    # so no document is translated (and billed) again for a language that was a cache hit
+    input_groups = [(f"{context.job_prefix}input-{index}/", codes, group_files)
+                    for index, (codes, group_files) in enumerate(pending.items())]
+
+    # Upload every source and glossary file once through the bounded upload pool
+    uploads = [
+        (file.filename, upload_blob,
+         (context, file.filename, file.stream, context.source_container_name, source_name_code, file.content_type,
+          input_prefix))
+        for input_prefix, _, group_files in input_groups
+        for file in group_files
+    ]
+    # Glossaries are stored once under their content hash and shared by every job that uses them
+    uploads += [
+        (glossary_file.filename, upload_glossary_blob,
+         (context, blob_name, glossary_file.stream, context.glossary_container_name))
+        for blob_name, glossary_file in glossary_streams.items()
+    ]
+    uploads_ok, results = upload_all(uploads)
+    if not uploads_ok:
+        return jsonify({
+            'status': 'error',
+            'message': 'One or more files failed to upload.',
+            'uploads': results
+        }), 500
+
+    # Each target gets only its own glossaries; the format comes from each file's extension
+    glossaries = {
+        code: [
+            {
+                "glossaryUrl": f"{context.container_url(context.glossary_container_name)}/{blob_name}",
+                "format": blob_name.rsplit('.', 1)[-1]
+            }
+            for blob_name in blob_names
+        ]
+        for code, blob_names in glossary_blobs.items()
+    }
+
+    base_path = f"{context.document_translation_endpoint}translator/document/batches"
     route = '?api-version=2024-05-01'
     constructed_url = base_path + route
 
-    # Prepare payload
-    if glossary_files:
-        payload = {
-            "inputs": [
-                {
-                    "source": {
-                        "sourceUrl": f"https://{account_name}.blob.core.windows.net/{source_container_name}",
-                        "language": source_language_code
-                    },
-                    "targets": [
-                        {
-                            "targetUrl": f"https://{account_name}.blob.core.windows.net/{target_container_name}",
-                            "language": target_language_code,
-                            "glossaries": [
-                                {
-                                    "glossaryUrl": f"https://{account_name}.blob.core.windows.net/{glossary_container_name}/glossary.csv",
-                                    "format": glossary_file_extension
-                                }
-                            ]
-                        }
-                    ]
-                }
-            ]
-        }
-    else:
-        payload = {
-            "inputs": [
-                {
-                    "source": {
-                        "sourceUrl": f"https://{account_name}.blob.core.windows.net/{source_container_name}",
-                        "language": source_language_code
-                    },
-                    "targets": [
-                        {
-                            "targetUrl": f"https://{account_name}.blob.core.windows.net/{target_container_name}",
-                            "language": target_language_code
-                        }
-                    ]
-                }
-            ]
+    def target_for(code):
+        # Every language writes under its own prefix, whichever input it comes from
+        target = {
+            "targetUrl": f"{context.container_url(context.target_container_name)}/{context.job_prefix}{code}/",
+            "language": code
         }
+        if glossaries.get(code):
+            target["glossaries"] = glossaries[code]
+        return target
+
+    # Prepare payload: one input per group of documents, with only the targets that group still needs
+    payload = {
+        "inputs": [
+            {
+                "source": {
+                    "sourceUrl": context.container_url(context.source_container_name),
+                    "filter": {"prefix": input_prefix},
+                    "language": source_language_code
+                },
+                "targets": [target_for(code) for code in codes]
+            }
+            for input_prefix, codes, _ in input_groups
+        ]
+    }
 
     headers = {
-        'Ocp-Apim-Subscription-Key': api_key,
+        'Ocp-Apim-Subscription-Key': context.api_key,
         'Content-Type': 'application/json'
     }
 
     try:
-        response = requests.post(constructed_url, headers=headers, json=payload)
+        response = http_client.post(constructed_url, headers=headers, json=payload)
         response.raise_for_status()
-        job_id = response.json().get('id')  # Get the job ID from the response
+        # The batch id comes back in the Operation-Location header (.../batches/<id>)
+        operation_location = response.headers.get('Operation-Location', '')
+        job_id = operation_location.split('?')[0].rstrip('/').rsplit('/', 1)[-1] or None
+        if not job_id and response.content:
+            job_id = response.json().get('id')
     except requests.exceptions.RequestException as e:
         logging.error(f"Request to Translator API failed: {str(e)}")
         return jsonify({
@@ -362,45 +491,54 @@ def docu_trans_azure2():
             'message': str(e)
         }), 500
 
-    # Polling for the translation job status
-    polling_interval = 1  # Poll every 1 second
-    timeout = 600  # Timeout after 10 minutes
-    elapsed_time = 0
-
-    while elapsed_time < timeout:
-        time.sleep(polling_interval)
-        elapsed_time += polling_interval
-        try:
-            status_response = check_translation_status(job_id)
-            if status_response.get('status') == 'Succeeded':
-                # Call get_blob_sas_urls immediately upon success
-                sas_urls = get_blob_sas_urls(account_name, account_key, target_container_name)
-                logging.info(f"SAS URLs: {sas_urls}")
-                break
-            elif status_response.get('status') in ['Failed', 'Cancelled']:
-                logging.error(f"Translation job failed: {status_response}")
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Translation job failed.'
-                }), 500
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error checking translation status: {str(e)}")
-            return jsonify({
-                'status': 'error',
-                'message': str(e)
-            }), 500
-
-    # If job is succeeded, no need for additional waits
+    if not job_id:
+        logging.error("Translator API did not return a job id.")
+        return jsonify({
+            'status': 'error',
+            'message': 'Translator API did not return a job id.'
+        }), 500
+
+    # Store the job and hand it to the background poller; only names and prefixes are stored, never keys
+    try:
+        register_job(
+            job_id,
+            'document_translation',
+            params={
+                'admin_id': admin_id,
+                'job_prefix': context.job_prefix,
+                'target_container_name': context.target_container_name,
+                'source_language_code': source_language_code,
+                'cache_keys': [[code, file_name, cache_key] for (code, file_name), cache_key in cache_keys.items()]
+            },
+            # Whole request body as a size hint for the first status check
+            document_bytes=request.content_length,
+            details={
+                'job_prefix': context.job_prefix,
+                'target_languages': target_codes,
+                'source_container_name': context.source_container_name,
+                'target_container_name': context.target_container_name,
+                'glossary_container_name': context.glossary_container_name
+            }
+        )
+    except Exception as e:
+        logging.error(f"Failed to record translation job {job_id}: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'job_id': job_id,
+            'message': f"Translation job was submitted but could not be recorded: {str(e)}"
+        }), 500
+
     return jsonify({
+        'job_id': job_id,
+        'status': 'Submitted',
+        'status_url': f"/translate/azure/documents/{job_id}",
         'status_code': response.status_code,
-        'status': response.reason,
         'headers': dict(response.headers),
-        'content': response.json(),
-        'sas_urls': sas_urls,
-        'source_container_name': source_container_name,
-        'target_container_name': target_container_name,
-        'glossary_container_name': glossary_container_name
-    }), 200
-
-if __name__ == '__main__':
-    app.run(debug=True)
+        'job_prefix': context.job_prefix,
+        'target_languages': target_codes,
+        'cached': cached,
+        'source_container_name': context.source_container_name,
+        'target_container_name': context.target_container_name,
+        'glossary_container_name': context.glossary_container_name,
+        'uploads': results
+    }), 202
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import os
+import time
+from db_connection import get_connection
+from storage_layout import ensure_container
+
+# Document result cache configuration
+DOC_CACHE_ENABLED = os.getenv('DOC_CACHE_ENABLED', 'true').lower() == 'true'
+DOC_CACHE_CONTAINER = os.getenv('DOC_CACHE_CONTAINER', 'translation-cache')
+DOC_CACHE_MAX_BYTES = int(os.getenv('DOC_CACHE_MAX_BYTES', str(10 * 1024 ** 3)))  # 10 GiB of cached outputs
+DOC_CACHE_MAX_AGE = int(os.getenv('DOC_CACHE_MAX_AGE', str(30 * 24 * 3600)))  # 30 days
+HASH_CHUNK_SIZE = 1024 * 1024
+# Synchronous server-side copies are limited to 256 MiB; larger outputs are copied asynchronously
+SYNC_COPY_MAX_BYTES = 256 * 1024 * 1024
+DOC_CACHE_COPY_TIMEOUT = int(os.getenv('DOC_CACHE_COPY_TIMEOUT', '900'))  # Give up on an async copy after this
+
+
+def file_digest(stream):
+    """SHA-256 of a seekable stream, read in chunks; the stream is rewound afterwards."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(file_sha256, vendor, source_lang, target_lang, formality=None, glossary_hash=None):
+    """Cache key for one document under one set of translation options."""
+    parts = [file_sha256, vendor, source_lang or 'auto', target_lang, formality or 'default', glossary_hash or '']
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def bypass_requested(form):
+    # Callers can force a fresh vendor job; the new result still replaces the cached one
+    return form.get('bypass_cache', 'false').lower() == 'true'
+
+
+def lookup(cache_key, account_name=None):
+    """Return {'file_name', 'blob_name'} of a cached output, or None; a hit refreshes its last use.
+
+    With account_name only outputs stored in that storage account count as hits.
+    """
+    if not DOC_CACHE_ENABLED:
+        return None
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE document_cache
+                SET last_used_at = now() AT TIME ZONE 'utc'
+                WHERE cache_key = %s
+                  AND created_at > (now() AT TIME ZONE 'utc') - make_interval(secs => %s)
+                  AND NOT evicting
+                  AND (%s IS NULL OR account_name = %s)
+                RETURNING file_name, blob_name;
+            """, (cache_key, DOC_CACHE_MAX_AGE, account_name, account_name))
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+    except Exception as e:
+        logging.warning(f"Document cache lookup failed, translating without it: {e}")
+        return None
+    if row is None:
+        return None
+    logging.info(f"Document cache hit for {row[0]}.")
+    return {'file_name': row[0], 'blob_name': row[1]}
+
+
+def _wait_for_copy(blob_client):
+    """Wait for an asynchronous copy into blob_client to finish; returns the blob's properties."""
+    deadline = time.monotonic() + DOC_CACHE_COPY_TIMEOUT
+    delay = 1.0
+    while True:
+        properties = blob_client.get_blob_properties()
+        status = properties.copy.status
+        if status == 'success':
+            return properties
+        if status != 'pending':
+            raise RuntimeError(f"Copy {status}: {properties.copy.status_description}")
+        if time.monotonic() > deadline:
+            blob_client.abort_copy(properties.copy.id)
+            raise RuntimeError(f"Copy did not finish within {DOC_CACHE_COPY_TIMEOUT} seconds.")
+        time.sleep(delay)
+        delay = min(delay * 2, 10.0)
+
+
+def store(blob_service_client, cache_key, vendor, source_lang, target_lang, file_name, source_url, size_bytes=None):
+    """Copy a finished output (readable at source_url) into the cache container and index it.
+
+    Outputs of unknown size or above SYNC_COPY_MAX_BYTES are copied asynchronously,
+    and only indexed once the copy has finished.
+    """
+    if not DOC_CACHE_ENABLED:
+        return
+    blob_name = f"{cache_key}/{file_name}"
+    try:
+        ensure_container(blob_service_client, DOC_CACHE_CONTAINER)
+        blob_client = blob_service_client.get_blob_client(DOC_CACHE_CONTAINER, blob_name)
+        # Server-side copy inside the account; the bytes never pass through this worker
+        if size_bytes is not None and size_bytes <= SYNC_COPY_MAX_BYTES:
+            blob_client.start_copy_from_url(source_url, requires_sync=True)
+        else:
+            blob_client.start_copy_from_url(source_url)
+            size_bytes = _wait_for_copy(blob_client).size
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO document_cache (cache_key, vendor, source_lang, target_lang, file_name, blob_name,
+                                            size_bytes, account_name)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (cache_key) DO UPDATE
+                SET file_name = EXCLUDED.file_name,
+                    blob_name = EXCLUDED.blob_name,
+                    size_bytes = EXCLUDED.size_bytes,
+                    account_name = EXCLUDED.account_name,
+                    evicting = FALSE,
+                    created_at = EXCLUDED.created_at,
+                    last_used_at = EXCLUDED.last_used_at;
+            """, (cache_key, vendor, source_lang, target_lang, file_name, blob_name, size_bytes,
+                  blob_service_client.account_name))
+            conn.commit()
+            cursor.close()
+        logging.info(f"Cached translated document '{file_name}' as '{blob_name}'.")
+    except Exception as e:
+        logging.warning(f"Failed to cache translated document '{file_name}': {e}")
+
+
+def _delete_cached_blobs(blob_service_client, blob_names):
+    """Delete cache blobs in batches; returns the names that are gone (already missing counts as gone)."""
+    container_client = blob_service_client.get_container_client(DOC_CACHE_CONTAINER)
+    deleted = []
+    # delete_blobs accepts at most 256 blobs per batch request
+    for start in range(0, len(blob_names), 256):
+        batch = blob_names[start:start + 256]
+        try:
+            responses = container_client.delete_blobs(*batch, raise_on_any_failure=False)
+        except Exception as e:
+            # One failed batch is retried on the next run; the others still go ahead
+            logging.error(f"Failed to delete a batch of cached documents: {e}")
+            continue
+        deleted += [blob_name for blob_name, response in zip(batch, responses)
+                    if response.status_code in (202, 404)]
+    return deleted
+
+
+def evict(blob_service_clients):
+    """Drop entries past DOC_CACHE_MAX_AGE, then least recently used ones beyond DOC_CACHE_MAX_BYTES.
+
+    Each blob is deleted through the client (from blob_service_clients) of the
+    account it was stored in. Entries are hidden from lookups first and their rows
+    removed only once the blob is gone, so a failed delete is retried on the next
+    run instead of leaking the blob. Returns the number of entries removed.
+    """
+    if not DOC_CACHE_ENABLED:
+        return 0
+    clients = {client.account_name: client for client in blob_service_clients}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE document_cache
+            SET evicting = TRUE
+            WHERE evicting
+               OR created_at <= (now() AT TIME ZONE 'utc') - make_interval(secs => %s)
+               OR cache_key IN (
+                   SELECT cache_key FROM (
+                       SELECT cache_key,
+                              SUM(size_bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS running_bytes
+                       FROM document_cache
+                   ) ranked
+                   WHERE running_bytes > %s
+               )
+            RETURNING cache_key, blob_name, account_name;
+        """, (DOC_CACHE_MAX_AGE, DOC_CACHE_MAX_BYTES))
+        entries = cursor.fetchall()
+        conn.commit()
+        cursor.close()
+
+    # No pooled connection is held while the blobs are deleted
+    by_account = {}
+    for cache_key, blob_name, account_name in entries:
+        by_account.setdefault(account_name, {})[blob_name] = cache_key
+
+    removed_keys = []
+    for account_name, keys_by_blob in by_account.items():
+        client = clients.get(account_name)
+        if client is None:
+            logging.error(f"No storage client for account '{account_name}'; "
+                          f"{len(keys_by_blob)} cached documents stay until one is configured.")
+            continue
+        removed_keys += [keys_by_blob[blob_name] for blob_name in _delete_cached_blobs(client, list(keys_by_blob))]
+
+    if removed_keys:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM document_cache WHERE cache_key = ANY(%s);", (removed_keys,))
+            conn.commit()
+            cursor.close()
+        logging.info(f"Evicted {len(removed_keys)} cached translated documents.")
+    return len(removed_keys)
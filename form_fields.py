@@ -0,0 +1,4 @@
+def parse_target_languages(values):
+    """Target languages from repeated form fields and/or comma-separated lists, in order, without duplicates."""
+    names = [name.strip() for value in values for name in value.split(',')]
+    return list(dict.fromkeys(name for name in names if name))
@@ -0,0 +1,112 @@
+import codecs
+import csv
+import hashlib
+import os
+import re
+import unicodedata
+
+# DeepL caps a glossary's entries at 10 MiB; this is also the parser's memory budget for the terms
+GLOSSARY_MAX_BYTES = int(os.getenv('GLOSSARY_MAX_BYTES', str(10 * 1024 * 1024)))
+GLOSSARY_MAX_ERRORS = 20  # Report at most this many bad rows
+
+DELIMITERS = {'csv': ',', 'tsv': '\t'}
+# Control characters (tabs and line breaks included) are not allowed inside a term
+_INVALID_CHARACTERS = re.compile(r'[\x00-\x1f\x7f-\x9f\u2028\u2029]')
+
+
+class GlossaryValidationError(ValueError):
+    """The glossary breaks the vendor's rules; errors lists what was wrong, row by row."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+class ParsedGlossary:
+    def __init__(self, entries, duplicates):
+        self.entries = entries  # [(source_term, target_term)], first occurrence order
+        self.duplicates = duplicates  # Identical rows that were dropped
+
+    def tsv(self):
+        # One join over all entries, linear in the glossary size
+        return '\n'.join(f"{source_term}\t{target_term}" for source_term, target_term in self.entries)
+
+
+def delimiter_for(file_name):
+    """',' or '\\t' from the file extension, or None for unsupported files."""
+    return DELIMITERS.get(file_name.rsplit('.', 1)[-1].lower()) if '.' in file_name else None
+
+
+def normalize_term(term):
+    return unicodedata.normalize('NFC', term.strip())
+
+
+def term_problem(term):
+    if not term:
+        return 'empty term'
+    if _INVALID_CHARACTERS.search(term):
+        return 'term contains a tab, line break or control character'
+    return None
+
+
+def _digest(term):
+    # Fixed-size fingerprints keep the duplicate set small even for very large term bases
+    return hashlib.blake2b(term.encode('utf-8'), digest_size=16).digest()
+
+
+def parse_glossary(stream, delimiter, max_bytes=GLOSSARY_MAX_BYTES):
+    """Read (source, target) pairs from a binary CSV/TSV stream one row at a time.
+
+    Terms are trimmed and NFC-normalized, identical rows are dropped, and every
+    DeepL rule is checked before anything is sent: no empty terms, no control
+    characters, one target per source term, and the size limit. Raises
+    GlossaryValidationError with the offending rows.
+    """
+    reader = csv.reader(codecs.getreader('utf-8-sig')(stream), delimiter=delimiter)
+    entries = []
+    targets_by_source = {}  # source fingerprint -> target fingerprint
+    errors = []
+    duplicates = 0
+    total_bytes = 0
+
+    def reject(message):
+        if len(errors) < GLOSSARY_MAX_ERRORS:
+            errors.append(f"Row {reader.line_num}: {message}")
+
+    try:
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue  # Blank line
+            if len(row) < 2:
+                reject('expected a source and a target term')
+                continue
+            source_term, target_term = normalize_term(row[0]), normalize_term(row[1])
+            problem = term_problem(source_term) or term_problem(target_term)
+            if problem:
+                reject(problem)
+                continue
+
+            source_key, target_key = _digest(source_term), _digest(target_term)
+            previous = targets_by_source.get(source_key)
+            if previous is not None:
+                if previous == target_key:
+                    duplicates += 1
+                else:
+                    reject(f"source term '{source_term}' already has a different target")
+                continue
+            targets_by_source[source_key] = target_key
+
+            total_bytes += len(source_term.encode('utf-8')) + len(target_term.encode('utf-8')) + 2
+            if total_bytes > max_bytes:
+                raise GlossaryValidationError([f"Glossary is larger than {max_bytes} bytes."])
+            entries.append((source_term, target_term))
+    except UnicodeDecodeError:
+        raise GlossaryValidationError(['Glossary file is not valid UTF-8.'])
+    except csv.Error as e:
+        raise GlossaryValidationError([f"Row {reader.line_num}: {e}"])
+
+    if errors:
+        raise GlossaryValidationError(errors)
+    if not entries:
+        raise GlossaryValidationError(['Glossary has no entries.'])
+    return ParsedGlossary(entries, duplicates)
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import http_client
+from db_connection import get_connection
+
+# DeepL glossary reuse configuration
+GLOSSARY_MAX_IDLE = int(os.getenv('DEEPL_GLOSSARY_MAX_IDLE', str(7 * 24 * 3600)))  # Delete after a week unused
+
+
+def entries_hash(source_lang, target_lang, entries):
+    """Hash of a glossary's (source, target) pairs plus its language pair; entry order does not matter."""
+    digest = hashlib.sha256(f"{source_lang}|{target_lang}".encode('utf-8'))
+    for source_term, target_term in sorted(entries):
+        digest.update(f"\n{source_term}\t{target_term}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _auth_headers():
+    return {"Authorization": f"DeepL-Auth-Key {os.getenv('DEEPL_API_KEY')}"}
+
+
+def _delete_remote(glossary_id):
+    response = http_client.delete(f"{os.getenv('DEEPL_API_GLOSSARY_URL')}/{glossary_id}", headers=_auth_headers())
+    # 404: already gone, which is what we wanted
+    if response.status_code not in (204, 404):
+        response.raise_for_status()
+
+
+def lookup(glossary_hash):
+    """glossary_id registered for this hash, or None; a hit counts as a use."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE deepl_glossaries
+            SET last_used_at = now() AT TIME ZONE 'utc'
+            WHERE entries_hash = %s
+            RETURNING glossary_id;
+        """, (glossary_hash,))
+        row = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+    return row[0] if row else None
+
+
+def register(glossary_hash, glossary_id, source_lang, target_lang):
+    """Record a newly created glossary; returns the id that won if another worker registered one first."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO deepl_glossaries (entries_hash, glossary_id, source_lang, target_lang)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (entries_hash) DO UPDATE SET last_used_at = now() AT TIME ZONE 'utc'
+            RETURNING glossary_id;
+        """, (glossary_hash, glossary_id, source_lang, target_lang))
+        registered_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+    return registered_id
+
+
+def get_or_create(source_lang, target_lang, entries, create):
+    """Reuse the DeepL glossary with these entries, or call create() -> glossary_id and remember it.
+
+    Returns (glossary_id, reused). If the registry is unavailable the glossary is
+    simply created, as it was before the registry existed.
+    """
+    glossary_hash = entries_hash(source_lang, target_lang, entries)
+    try:
+        glossary_id = lookup(glossary_hash)
+    except Exception as e:
+        logging.warning(f"Glossary registry unavailable, creating a new glossary: {e}")
+        return create(glossary_hash), False
+    if glossary_id:
+        logging.info(f"Reusing DeepL glossary {glossary_id} for {source_lang}->{target_lang}.")
+        return glossary_id, True
+
+    glossary_id = create(glossary_hash)
+    try:
+        registered_id = register(glossary_hash, glossary_id, source_lang, target_lang)
+    except Exception as e:
+        logging.warning(f"Failed to register DeepL glossary {glossary_id}: {e}")
+        return glossary_id, False
+
+    if registered_id != glossary_id:
+        # Lost a race with another worker creating the same glossary; keep theirs
+        try:
+            _delete_remote(glossary_id)
+        except Exception as e:
+            logging.error(f"Failed to delete duplicate DeepL glossary {glossary_id}: {e}")
+        return registered_id, True
+    return glossary_id, False
+
+
+def collect_garbage():
+    """Delete glossaries unused for GLOSSARY_MAX_IDLE seconds, at DeepL and in the registry.
+
+    Returns the number of glossaries removed.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT entries_hash, glossary_id FROM deepl_glossaries
+            WHERE last_used_at < (now() AT TIME ZONE 'utc') - make_interval(secs => %s);
+        """, (GLOSSARY_MAX_IDLE,))
+        idle = cursor.fetchall()
+
+        removed = 0
+        for glossary_hash, glossary_id in idle:
+            # Forget it first so no request picks it up while it is being deleted
+            cursor.execute("""
+                DELETE FROM deepl_glossaries
+                WHERE entries_hash = %s
+                  AND last_used_at < (now() AT TIME ZONE 'utc') - make_interval(secs => %s);
+            """, (glossary_hash, GLOSSARY_MAX_IDLE))
+            conn.commit()
+            if not cursor.rowcount:
+                continue  # Used again in the meantime
+            try:
+                _delete_remote(glossary_id)
+                removed += 1
+            except Exception as e:
+                logging.error(f"Failed to delete DeepL glossary {glossary_id}: {e}")
+        cursor.close()
+
+    if removed:
+        logging.info(f"Deleted {removed} unused DeepL glossaries.")
+    return removed
@@ -0,0 +1,7 @@
+# Picked up automatically by gunicorn when started from this directory (gunicorn app:app)
+
+
+def post_fork(server, worker):
+    # Background threads do not survive a fork, so every worker starts its own
+    from app import start_background_workers
+    start_background_workers()
@@ -0,0 +1,91 @@
+import logging
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection pool sizing per worker process
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', '10'))  # Distinct hosts kept warm
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))  # Keep-alive connections per host
+# Default timeouts (seconds) for calls that do not pass their own
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '60'))
+# Retry policy for throttling and transient server errors
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses where the server did not act on the request, so even a POST is safe to resend
+REJECTED_STATUSES = (429, 503)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+class JitteredRetry(Retry):
+    """Exponential backoff with full jitter; non-idempotent calls only retry on rejections."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return min(HTTP_BACKOFF_MAX, random.uniform(0, backoff)) if backoff else 0
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        # POST is not idempotent, but a throttled or unavailable request was never acted on
+        if status_code in REJECTED_STATUSES and self.total:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class _Session(requests.Session):
+    # requests has no session-wide timeout, so apply the defaults here
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        return super().request(method, url, **kwargs)
+
+
+def _build_session():
+    retry = JitteredRetry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = _Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    logging.info(f"HTTP client created (hosts={HTTP_POOL_HOSTS}, per-host pool={HTTP_POOL_MAXSIZE}).")
+    return session
+
+
+def get_session():
+    """Shared keep-alive session for this worker process."""
+    global _session, _session_pid
+    # Sockets must not be shared across a fork, so each worker process builds its own session
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = _build_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return get_session().delete(url, **kwargs)
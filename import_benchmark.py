@@ -0,0 +1,91 @@
+"""Measure the cold-start cost of importing the app.
+
+Each run imports the module in a fresh interpreter with -X importtime and reports
+the median wall time (minus a bare interpreter start) and the slowest imports.
+Pass --history to append the result as one JSON line, so startup cost can be
+tracked from commit to commit.
+
+    python import_benchmark.py --runs 5 --history import_times.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+def _run(code, env, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    started = time.perf_counter()
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        sys.exit(f"'{code}' failed:\n{completed.stderr}")
+    return elapsed, completed.stderr
+
+
+def _slowest_imports(importtime_output, top):
+    """Top-level packages by cumulative import time, from -X importtime output."""
+    cumulative = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total_us, name = (part.strip() for part in line.split(':', 1)[1].split('|'))
+        if not total_us.isdigit():
+            continue  # Header line
+        package = name.split('.')[0]
+        cumulative[package] = max(cumulative.get(package, 0), int(total_us))
+    ranked = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'module': module, 'cumulative_ms': round(total_us / 1000, 1)} for module, total_us in ranked]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--history', help='Append the result as a JSON line to this file')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    baseline = statistics.median(_run('pass', env)[0] for _ in range(args.runs))
+    timings = []
+    importtime_output = ''
+    for _ in range(args.runs):
+        elapsed, importtime_output = _run(f"import {args.module}", env, importtime=True)
+        timings.append(elapsed - baseline)
+
+    result = {
+        'measured_at': datetime.utcnow().isoformat() + 'Z',
+        'commit': _git_commit(),
+        'module': args.module,
+        'runs': args.runs,
+        'median_ms': round(statistics.median(timings) * 1000, 1),
+        'min_ms': round(min(timings) * 1000, 1),
+        'slowest_imports': _slowest_imports(importtime_output, args.top),
+    }
+
+    print(f"import {args.module}: median {result['median_ms']} ms, min {result['min_ms']} ms over {args.runs} runs")
+    for entry in result['slowest_imports']:
+        print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+    if args.history:
+        with open(args.history, 'a') as history:
+            history.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
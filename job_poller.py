@@ -0,0 +1,123 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import psycopg2
+import requests
+
+# Threads that run status checks; the scheduler itself is a single thread
+POLLER_WORKERS = int(os.getenv('JOB_POLLER_WORKERS', '4'))
+
+
+class JobTimeout(Exception):
+    """Raised into a watched job's future when its polling schedule runs out."""
+
+
+def is_transient(error):
+    """Network and database hiccups: the check is retried on the job's schedule instead of failing it."""
+    if isinstance(error, requests.HTTPError):
+        # Client errors (bad key, unknown job) will not fix themselves; throttling and server errors may
+        response = error.response
+        return response is None or response.status_code == 429 or response.status_code >= 500
+    return isinstance(error, (requests.RequestException, psycopg2.OperationalError))
+
+
+class JobPoller:
+    """One scheduler for every outstanding vendor job.
+
+    Jobs sit in a min-heap keyed by their next check time. The scheduler thread
+    sleeps until the earliest one is due and hands due checks to a small worker
+    pool, so the thread count does not grow with the number of jobs.
+
+    A check is a callable returning (finished, result, hints): finished jobs resolve
+    their future with result, otherwise hints are passed to schedule.next_delay().
+    A check that raises a transient error is simply tried again later; any other
+    error, or the schedule running out, fails the future.
+    """
+
+    def __init__(self, workers=POLLER_WORKERS):
+        self._heap = []
+        self._sequence = itertools.count()  # Tie-breaker so entries never compare jobs
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-poller-check')
+        self._in_flight = 0
+        self._thread = threading.Thread(target=self._run, name='job-poller', daemon=True)
+        self._thread.start()
+
+    def watch(self, check, schedule):
+        """Start polling a job; returns a Future completed with the check's final result."""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self._push(time.monotonic() + schedule.first_delay(), (check, schedule, future))
+        return future
+
+    def pending(self):
+        with self._condition:
+            return len(self._heap) + self._in_flight
+
+    def _push(self, due, job):
+        with self._condition:
+            heapq.heappush(self._heap, (due, next(self._sequence), job))
+            # Wake the scheduler in case this job is due before the one it is sleeping on
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                _, _, job = heapq.heappop(self._heap)
+                self._in_flight += 1
+            self._executor.submit(self._check, *job)
+
+    def _check(self, check, schedule, future):
+        # Whatever happens, the future is either resolved or the job is back on the heap
+        try:
+            try:
+                finished, result, hints = check()
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+            if finished:
+                future.set_result(result)
+                return
+            if schedule.expired():
+                raise JobTimeout(f"Job not finished after {schedule.attempts + 1} status checks.")
+            self._push(time.monotonic() + schedule.next_delay(**(hints or {})), (check, schedule, future))
+        except JobTimeout as e:
+            future.set_exception(e)
+        except Exception as e:
+            if not is_transient(e) or schedule.expired():
+                future.set_exception(e)
+                return
+            logging.warning(f"Status check failed, retrying on schedule: {e}")
+            try:
+                self._push(time.monotonic() + schedule.next_delay(), (check, schedule, future))
+            except Exception as push_error:
+                future.set_exception(push_error)
+
+
+_poller = None
+_poller_pid = None
+_poller_lock = threading.Lock()
+
+
+def get_poller():
+    """The process-wide poller; recreated after a fork since threads do not survive it."""
+    global _poller, _poller_pid
+    if _poller is not None and _poller_pid == os.getpid():
+        return _poller
+    with _poller_lock:
+        if _poller is None or _poller_pid != os.getpid():
+            _poller = JobPoller()
+            _poller_pid = os.getpid()
+            logging.info("Started the central job poller.")
+        return _poller
+
+
+def watch(check, schedule):
+    return get_poller().watch(check, schedule)
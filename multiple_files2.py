@@ -1,11 +1,21 @@
-from flask import Flask, request, jsonify
-import requests
-import time
+from flask import request, jsonify
+import http_client
+import logging
+import job_poller
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
 from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
 import os
-
-app = Flask(__name__)
+import hashlib
+import tempfile
+import threading
+import time
+import document_cache
+from blob_uploads import language_blob_name, upload_stream
+from form_fields import parse_target_languages
+from job_poller import JobTimeout
+from polling_policy import PollSchedule, get_policy, retry_after_seconds
+from storage_layout import TARGET_CONTAINER, ensure_container, new_job_prefix
 
 # Language mapping as provided
 language_mapping = {
@@ -58,155 +68,363 @@ DEEPL_API_URL = os.getenv('DEEPL_API_URL')
 DEEPL_API_KEY = os.getenv('DEEPL_API_KEY')  # Replace with your actual DeepL API key
 STORAGE_CONNECTION_STRING = os.getenv('STORAGE_CONNECTION_STRING')
 
+# Upper bound on documents being translated at the same time in this worker
+MAX_CONCURRENT_DOCUMENTS = int(os.getenv('DEEPL_MAX_CONCURRENT_DOCUMENTS', '8'))
+document_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOCUMENTS, thread_name_prefix='deepl-document')
+# Copies into the document result cache run here, so nobody waits for them
+cache_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='deepl-cache')
+# Where incoming files are spooled so every target language can re-read them
+SPOOL_DIR = os.getenv('DEEPL_SPOOL_DIR') or None  # None -> the system temp directory
+# Longest a request waits for its documents: the polling timeout plus time for the transfers
+REQUEST_TIMEOUT = float(os.getenv('DEEPL_REQUEST_TIMEOUT', str(get_policy('deepl').timeout + 600)))
+
+
+
+# Azure Blob Service Client, created on first use so importing this module stays cheap
+_blob_service_client = None
+_blob_service_client_lock = threading.Lock()
+
+
+def get_blob_service_client():
+    global _blob_service_client
+    if _blob_service_client is None:
+        with _blob_service_client_lock:
+            if _blob_service_client is None:
+                from azure.storage.blob import BlobServiceClient  # Imported with the client, on first use
+                _blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+    return _blob_service_client
+
+
+class SpooledFile:
+    """An uploaded file copied to local disk once, so each (file, language) job can open its own handle."""
+
+    def __init__(self, upload):
+        self.filename = upload.filename
+        self.content_type = upload.content_type
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=SPOOL_DIR, suffix='.spool', delete=False) as spool:
+            self.path = spool.name
+            # Hash while copying so the result cache key costs no extra read
+            for chunk in iter(lambda: upload.stream.read(1024 * 1024), b''):
+                digest.update(chunk)
+                spool.write(chunk)
+        self.size = os.path.getsize(self.path)
+        self.sha256 = digest.hexdigest()
+
+    def open(self):
+        return open(self.path, 'rb')
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            logging.error(f"Failed to remove spooled file {self.path}: {e}")
+
+
+def glossaries_by_target(uploads, target_lang_codes):
+    """{target code: glossary file} from the request's files.
+
+    A glossary belongs to one language pair, so with several targets each one is sent
+    as glossary_file_<target> (the language name or its DeepL code). A plain
+    glossary_file is only accepted for a single target. Raises ValueError otherwise.
+    """
+    target_codes = set(target_lang_codes.values())
+    glossaries = {}
+    for field, upload in uploads.items():
+        if not upload or not upload.filename:
+            continue
+        if field == 'glossary_file':
+            if len(target_codes) > 1:
+                raise ValueError("glossary_file applies to a single target language; "
+                                 "send one glossary_file_<target_lang> per target instead.")
+            code = next(iter(target_codes))
+        elif field.startswith('glossary_file_'):
+            target = field[len('glossary_file_'):]
+            code = target_lang_codes.get(target) or (target.upper() if target.upper() in target_codes else None)
+            if not code:
+                raise ValueError(f"'{field}' does not match any requested target language.")
+        else:
+            continue
+        if code in glossaries:
+            raise ValueError(f"More than one glossary given for target language '{code}'.")
+        glossaries[code] = upload
+    return glossaries
+
+
+def _auth_headers():
+    return {
+        'Authorization': f'DeepL-Auth-Key {DEEPL_API_KEY}'
+    }
+
+
+def translate_document(file, source_lang_code, target_lang_code, formality, glossary_id, container_name, prefix='',
+                       cache_key=None):
+    """Starts the upload, polling, download and blob write for one file; returns a Future with the outcome.
+
+    Worker threads are only held while uploading and downloading. The wait in
+    between is tracked by the central job poller. With a cache_key the finished
+    output is also copied into the document result cache.
+    """
+    outcome = Future()
+
+    def run(step, *args):
+        # Keep one file's failure from cancelling the rest of the batch
+        def task():
+            try:
+                result = step(*args)
+            except Exception as e:
+                logging.error(f"Document translation failed for {file.filename}: {e}")
+                result = {"file_name": file.filename, "error": str(e)}
+            if result is not None:
+                outcome.set_result(result)
+        document_executor.submit(task)
+
+    def upload():
+        # Each (file, language) job reads its own handle on the spooled copy
+        with file.open() as stream:
+            document = _upload_document(file, stream, source_lang_code, target_lang_code, formality, glossary_id)
+        if 'error' in document:
+            return document
+        # Wait times follow DeepL's seconds_remaining and the document size
+        schedule = PollSchedule(get_policy('deepl'), file.size)
+        watched = job_poller.watch(partial(_check_document_status, document), schedule)
+        watched.add_done_callback(lambda future: run(finish, document, future))
+        return None
+
+    def finish(document, future):
+        try:
+            status_data = future.result()
+        except JobTimeout as e:
+            return {
+                "file_name": file.filename,
+                "error": f"Translation still in progress for {file.filename}: {e}",
+                "status_details": document.get('status_details', {})
+            }
+        if status_data['status'] != 'done':
+            error_message = status_data.get('error', 'Unknown error occurred')
+            return {
+                "file_name": file.filename,
+                "error": f"Translation failed for {file.filename}",
+                "status_details": status_data,
+                "error_message": error_message
+            }
+        result = _store_translation(file, document, target_lang_code, container_name, prefix)
+        size_bytes = result.pop('size_bytes', None)
+        if cache_key and 'sas_url' in result:
+            cache_executor.submit(_cache_translation, cache_key, source_lang_code, target_lang_code,
+                                  result['file_name'], result['sas_url'], size_bytes)
+        return result
 
+    run(upload)
+    return outcome
+
+
+def _cache_translation(cache_key, source_lang_code, target_lang_code, file_name, sas_url, size_bytes):
+    try:
+        document_cache.store(get_blob_service_client(), cache_key, 'deepl', source_lang_code, target_lang_code,
+                             file_name, sas_url, size_bytes)
+    except Exception as e:
+        logging.error(f"Failed to cache translated document '{file_name}': {e}")
+
+
+def _upload_document(file, stream, source_lang_code, target_lang_code, formality, glossary_id):
+    # Prepare file and payload for the DeepL API request
+    file_payload = {
+        'file': (file.filename, stream, file.content_type),
+        'target_lang': (None, target_lang_code),
+        'source_lang': (None, source_lang_code if source_lang_code != 'auto' else None),
+        'formality': (None, formality)
+    }
+
+    if glossary_id:
+        file_payload['glossary_id'] = (None, glossary_id)
+
+    # 1. Upload document for translation
+    response = http_client.post(DEEPL_API_URL, files=file_payload, headers=_auth_headers())
+
+    if response.status_code != 200:
+        return {"file_name": file.filename, "error": f"File upload failed for {file.filename}",
+                "status_code": response.status_code}
+
+    response_data = response.json()
+    return {"document_id": response_data['document_id'], "document_key": response_data['document_key']}
+
+
+def _check_document_status(document):
+    """2. One status check for the central poller: (finished, status_data, schedule hints)."""
+    status_response = http_client.post(f"{DEEPL_API_URL}/{document['document_id']}",
+                                       json={"document_key": document['document_key']},
+                                       headers=_auth_headers())
+    retry_after = retry_after_seconds(status_response)
+    if status_response.status_code == 429:
+        return False, None, {'retry_after': retry_after}
+
+    status_data = status_response.json()
+    document['status_details'] = status_data
+    if status_data['status'] not in ['translating', 'queued']:
+        return True, status_data, None
+    return False, None, {'seconds_remaining': status_data.get('seconds_remaining'), 'retry_after': retry_after}
+
+
+def _store_translation(file, document, target_lang_code, container_name, prefix):
+    # 3. Download the translated document
+    download_response = http_client.post(f"{DEEPL_API_URL}/{document['document_id']}/result",
+                                         json={"document_key": document['document_key']},
+                                         headers=_auth_headers(),
+                                         stream=True)
+
+    if download_response.status_code != 200:
+        download_response.close()
+        return {"file_name": file.filename, "error": f"Failed to download translated file for {file.filename}",
+                "status_code": download_response.status_code}
+
+    translated_file_name = language_blob_name(file.filename, target_lang_code)
+    translated_blob_name = prefix + translated_file_name
+
+    # 4. Upload the translated document to Azure Blob Storage
+    blob_client = get_blob_service_client().get_blob_client(container=container_name, blob=translated_blob_name)
+    # Stream the result straight into the blob instead of holding it in memory
+    download_response.raw.decode_content = True
+    with download_response:
+        size_bytes = upload_stream(blob_client, download_response.raw, download_response.headers.get('Content-Type'))
+
+    sas_url = _blob_sas_url(container_name, translated_blob_name)
+    return {"file_name": translated_file_name, "blob_name": translated_blob_name, "sas_url": sas_url,
+            "size_bytes": size_bytes}
+
+
+def _blob_sas_url(container_name, blob_name):
+    from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+    # Generate a SAS URL for the uploaded blob
+    sas_token = generate_blob_sas(
+        account_name=os.getenv('STORAGE_SERVICE_ACCOUNT_NAME'),  # Your storage account name
+        account_key=os.getenv('STORAGE_SERVICE_KEY'),  # Your account key
+        container_name=container_name,
+        blob_name=blob_name,
+        permission=BlobSasPermissions(read=True),
+        expiry=datetime.utcnow() + timedelta(hours=1)
+    )
+
+    return f"https://{get_blob_service_client().account_name}.blob.core.windows.net/{container_name}/{blob_name}?{sas_token}"
+
+
+def _cached_result(cached):
+    """A finished Future for a document served from the result cache."""
+    future = Future()
+    future.set_result({"file_name": cached['file_name'], "blob_name": cached['blob_name'], "cached": True,
+                       "sas_url": _blob_sas_url(document_cache.DOC_CACHE_CONTAINER, cached['blob_name'])})
+    return future
+
+
+def _language_manifest(target_codes, jobs, results):
+    """Per-language view of the results: {code: {sas_urls, errors, results}}."""
+    manifest = {code: {"sas_urls": [], "errors": [], "results": []} for code in target_codes}
+    for (_, code), result in zip(jobs, results):
+        entry = manifest[code]
+        entry["results"].append(result)
+        if 'sas_url' in result:
+            entry["sas_urls"].append(result)
+        if 'error' in result:
+            entry["errors"].append(result)
+    return manifest
 
-# Initialize Azure Blob Service Client
-blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
 
-@app.route('/multiple_files2', methods=['POST'])
 def multiple_files2():
     try:
         # Retrieve form data
         files = request.files.getlist('file')
         source_lang = request.form.get('source_lang', 'auto')
-        target_lang = request.form['target_lang']
+        target_langs = parse_target_languages(request.form.getlist('target_lang'))
         formality = request.form['formality']
-        glossary_file = request.files.get('glossary_file')
 
         source_lang_code = language_mapping.get(source_lang, 'auto')
-        target_lang_code = language_mapping.get(target_lang)
-
-        if glossary_file:
-            from create_glossary_deepl2 import upload_glossary
-            response = upload_glossary(source_lang,target_lang,glossary_file)
-            print('Response from Upload Glossary:',response)
-            gl_data = response  # Parse the JSON string
-            glossary_id = gl_data["glossary_id"]
-        
-        if not target_lang_code:
-            return jsonify({"error": "Invalid target language"}), 400
-
-        if target_lang_code not in formality_supported_languages and formality in ['more', 'less']:
-            return jsonify({
-                "error": f"Formality '{formality}' is not supported for the target language '{target_lang}'."
-            }), 400
-
-        # List to hold SAS URLs for all translated files
-        sas_urls = []
-
-        for file in files:
-            # Prepare file and payload for the DeepL API request
-            file_payload = {
-                'file': (file.filename, file.stream, file.content_type),
-                'target_lang': (None, target_lang_code),
-                'source_lang': (None, source_lang_code if source_lang_code != 'auto' else None),
-                'formality': (None, formality)
-            }
+        target_lang_codes = {target_lang: language_mapping.get(target_lang) for target_lang in target_langs}
 
-            if glossary_file:
-                file_payload['glossary_id'] = (None, glossary_id)
-
-            headers = {
-                'Authorization': f'DeepL-Auth-Key {DEEPL_API_KEY}'
-            }
+        if not target_lang_codes or not all(target_lang_codes.values()):
+            return jsonify({"error": "Invalid target language"}), 400
 
-            # 1. Upload document for translation
-            response = requests.post(DEEPL_API_URL, files=file_payload, headers=headers)
-
-            if response.status_code != 200:
-                return jsonify({"error": f"File upload failed for {file.filename}"}), response.status_code
-
-            response_data = response.json()
-            document_id = response_data['document_id']
-            document_key = response_data['document_key']
-
-            # 2. Check translation status (polling)
-            check_status_url = f"{DEEPL_API_URL}/{document_id}"
-            status_payload = {"document_key": document_key}
-
-            max_retries = 20
-            retry_count = 0
-            status = 'translating'
-
-            retry_count = 0
-            retry_interval = 10  # Start with 10 seconds
-    
-            while status in ['translating', 'queued'] and retry_count < max_retries:
-                time.sleep(retry_interval)
-                status_response = requests.post(check_status_url, json=status_payload, headers=headers)
-                status_data = status_response.json()
-                status = status_data['status']
-    
-                if status == 'done':
-                    break
-                elif status == 'failed':
-                    error_message = status_data.get('error', 'Unknown error occurred')
-                    return jsonify({
-                        "error": f"Translation failed for {file.filename}",
-                        "status_details": status_data,
-                        "error_message": error_message
-                    }), 500
-    
-                # Exponential backoff: double the wait time after each retry
-                retry_interval = min(retry_interval * 2, 300)  # Cap the wait time at 5 minutes
-                retry_count += 1
-
-            if status != 'done':
+        for target_lang, target_lang_code in target_lang_codes.items():
+            if target_lang_code not in formality_supported_languages and formality in ['more', 'less']:
                 return jsonify({
-                    "error": f"Translation still in progress for {file.filename} after maximum retries.",
-                    "status_details": status_data
-                }), 500
-
-            # 3. Download the translated document
-            download_response = requests.post(f"{DEEPL_API_URL}/{document_id}/result", 
-                                            json={"document_key": document_key}, 
-                                            headers=headers)
-
-            if download_response.status_code != 200:
-                return jsonify({"error": f"Failed to download translated file for {file.filename}"}), download_response.status_code
-
-
-
-
-
-            
-
-
-
-    
-
-            translated_blob_name = f"{file.filename.rsplit('.', 1)[0]}-{target_lang_code}.{file.filename.rsplit('.', 1)[-1]}"
-
-            # Upload the translated document to Azure Blob Storage
-            container_name = f"destination-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            blob_service_client.create_container(container_name)
-
-            blob_client = blob_service_client.get_blob_client(container=container_name, blob=translated_blob_name)
-
-            # Upload the translated content
-            blob_client.upload_blob(download_response.content, overwrite=True)
-
-            # Generate a SAS URL for the uploaded blob
-            sas_token = generate_blob_sas(
-                account_name=os.getenv('STORAGE_SERVICE_ACCOUNT_NAME'),  # Your storage account name
-                account_key=os.getenv('STORAGE_SERVICE_KEY'),  # Your account key
-                container_name=container_name,
-                blob_name=translated_blob_name,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=1)
-            )
-
-            sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{translated_blob_name}?{sas_token}"
-            sas_urls.append({"file_name": translated_blob_name, "sas_url": sas_url})
-
-        # Return the list of SAS URLs for all uploaded files
-        return jsonify({"sas_urls": sas_urls})
+                    "error": f"Formality '{formality}' is not supported for the target language '{target_lang}'."
+                }), 400
+
+        target_codes = list(dict.fromkeys(target_lang_codes.values()))
+        target_names = {code: target_lang for target_lang, code in reversed(list(target_lang_codes.items()))}
+        bypass_cache = document_cache.bypass_requested(request.form)
+
+        # DeepL glossaries are per language pair, so each target brings its own
+        try:
+            glossary_files = glossaries_by_target(request.files, target_lang_codes)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        glossary_hashes = {code: document_cache.file_digest(glossary_file.stream)
+                           for code, glossary_file in glossary_files.items()}
+
+        # Shared destination container; every request writes under its own prefix
+        container_name = TARGET_CONTAINER
+        job_prefix = new_job_prefix()
+        ensure_container(get_blob_service_client(), container_name)
+
+        # Read each incoming stream once; every target language re-reads the local copy
+        spooled_files = []
+        try:
+            for file in files:
+                spooled_files.append(SpooledFile(file))
+
+            # Same bytes, languages, formality and glossary as an earlier job: reuse its output
+            jobs = [(file, code) for file in spooled_files for code in target_codes]
+            cache_keys = [document_cache.make_key(file.sha256, 'deepl', source_lang_code, code, formality,
+                                                  glossary_hashes.get(code))
+                          for file, code in jobs]
+            account_name = get_blob_service_client().account_name
+            cached = [None if bypass_cache else document_cache.lookup(cache_key, account_name)
+                      for cache_key in cache_keys]
+
+            # Register the glossary of every target that still needs DeepL
+            glossary_ids = {}
+            if glossary_files:
+                from create_glossary_deepl2 import upload_glossary
+                for code in dict.fromkeys(code for (_, code), hit in zip(jobs, cached) if not hit):
+                    glossary_file = glossary_files.get(code)
+                    if not glossary_file:
+                        continue
+                    glossary_file.stream.seek(0)
+                    response = upload_glossary(source_lang, target_names[code], glossary_file)
+                    logging.info(f"Response from Upload Glossary: {response}")
+                    if 'error' in response:
+                        # Rejected before reaching DeepL (or by DeepL); nothing has been translated yet
+                        return jsonify({"error": response["error"]}), response.get("status_code", 500)
+                    glossary_ids[code] = response["glossary_id"]
+
+            # One upload/poll/download cycle per (file, language) pair; transfers share the executor, waits the poller
+            futures = [
+                _cached_result(hit) if hit else
+                translate_document(file, source_lang_code, code, formality, glossary_ids.get(code),
+                                   container_name, job_prefix, cache_key)
+                for (file, code), cache_key, hit in zip(jobs, cache_keys, cached)
+            ]
+            deadline = time.monotonic() + REQUEST_TIMEOUT
+            results = []
+            for (file, _), future in zip(jobs, futures):
+                try:
+                    results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                except FutureTimeoutError:
+                    logging.error(f"Gave up waiting for the translation of {file.filename}.")
+                    results.append({"file_name": file.filename,
+                                    "error": f"Timed out waiting for the translation of {file.filename}"})
+        finally:
+            for spooled_file in spooled_files:
+                spooled_file.remove()
+
+        # SAS URLs for all successfully translated files, plus per-file results
+        sas_urls = [result for result in results if 'sas_url' in result]
+        errors = [result for result in results if 'error' in result]
+
+        status_code = 500 if results and not sas_urls else 200
+        return jsonify({"sas_urls": sas_urls, "errors": errors, "results": results,
+                        "languages": _language_manifest(target_codes, jobs, results),
+                        "container_name": container_name, "job_prefix": job_prefix}), status_code
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
-
-
-if __name__ == '__main__':
-    app.run(debug=True)
-    
@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Per-vendor defaults; each value can be overridden with <VENDOR>_POLL_<NAME>, e.g. DEEPL_POLL_MAX_INTERVAL
+DEFAULTS = {
+    'azure': {
+        'min_interval': 1.0,  # Never check more often than this
+        'max_interval': 30.0,  # Never wait longer than this between checks
+        'backoff': 1.5,  # Growth factor once the estimate has run out
+        'base_seconds': 5.0,  # Fixed queueing/processing overhead of a job
+        'bytes_per_second': 100 * 1024.0,  # Rough throughput used to size the first wait
+        'timeout': float(os.getenv('AZURE_JOB_TIMEOUT', '600')),
+    },
+    'deepl': {
+        'min_interval': 1.0,
+        'max_interval': 60.0,
+        'backoff': 2.0,
+        'base_seconds': 3.0,
+        'bytes_per_second': 50 * 1024.0,
+        'timeout': 4800.0,  # About what the old 20 doubling retries added up to
+    },
+}
+
+_policies = {}
+
+
+class PollingPolicy:
+    """Poll timing settings for one vendor."""
+
+    def __init__(self, vendor, min_interval, max_interval, backoff, base_seconds, bytes_per_second, timeout):
+        self.vendor = vendor
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.base_seconds = base_seconds
+        self.bytes_per_second = bytes_per_second
+        self.timeout = timeout
+
+    def expected_seconds(self, document_bytes):
+        """Rough end-to-end time for a document of this size."""
+        return self.base_seconds + (document_bytes or 0) / self.bytes_per_second
+
+    def clamp(self, seconds):
+        return min(max(seconds, self.min_interval), self.max_interval)
+
+
+def get_policy(vendor):
+    """The polling policy for 'azure' or 'deepl', built once from DEFAULTS and the environment."""
+    policy = _policies.get(vendor)
+    if policy is None:
+        settings = {}
+        for name, default in DEFAULTS[vendor].items():
+            settings[name] = float(os.getenv(f"{vendor.upper()}_POLL_{name.upper()}", default))
+        policy = _policies[vendor] = PollingPolicy(vendor, **settings)
+    return policy
+
+
+class PollSchedule:
+    """Decides when to check one job next, from whatever hints the vendor gives back.
+
+    Hints are used in this order: seconds_remaining (DeepL), reported progress
+    (Azure summary), then the size-based estimate; once that runs out the wait
+    grows by the policy's backoff. A Retry-After value is always honoured.
+    """
+
+    def __init__(self, policy, document_bytes=None, elapsed=0.0):
+        self.policy = policy
+        # A job picked up from another worker keeps the time it has already spent
+        self.started = time.monotonic() - elapsed
+        self.expected_seconds = policy.expected_seconds(document_bytes)
+        self.attempts = 0
+        self.last_delay = None
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def expired(self):
+        return self.elapsed() > self.policy.timeout
+
+    def first_delay(self):
+        # Small documents get checked almost straight away, big ones not until they could be done
+        self.last_delay = self.policy.clamp(self.expected_seconds)
+        return self.last_delay
+
+    def next_delay(self, seconds_remaining=None, progress=None, retry_after=None):
+        policy = self.policy
+        elapsed = self.elapsed()
+        self.attempts += 1
+
+        if seconds_remaining is not None:
+            estimate = float(seconds_remaining)
+        elif progress is not None and 0 < progress < 1:
+            # Extrapolate from the share already finished
+            estimate = elapsed * (1 - progress) / progress
+        else:
+            estimate = self.expected_seconds - elapsed
+            if estimate <= 0:
+                estimate = (self.last_delay or policy.min_interval) * policy.backoff
+
+        delay = policy.clamp(estimate)
+        if retry_after:
+            delay = max(delay, retry_after)
+        # Do not sleep past the point where the job would time out anyway
+        delay = max(min(delay, policy.timeout - elapsed), 0)
+        self.last_delay = delay
+        return delay
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError) as e:
+        logging.error(f"Ignoring unparseable Retry-After header '{value}': {e}")
+        return None
+
+
+def azure_progress(summary):
+    """Share of documents in an Azure batch that are finished, from its status summary."""
+    if not summary or not summary.get('total'):
+        return None
+    finished = summary.get('success', 0) + summary.get('failed', 0) + summary.get('cancelled', 0)
+    return finished / summary['total']
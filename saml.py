@@ -4,7 +4,6 @@ import urllib.parse
 import datetime
 import jwt  # Import PyJWT for JWT operations
 from flask import session, redirect, request, jsonify
-from onelogin.saml2.auth import OneLogin_Saml2_Auth
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError  # Import JWT exceptions
 
 # SAML and JWT configuration
@@ -16,6 +15,8 @@ JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 # SAML functions
 def init_saml_auth(req, saml_path):
     print('In init auth')
+    # The SAML stack (xmlsec/lxml) is slow to import; only the SAML routes need it
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
     auth = OneLogin_Saml2_Auth(req, custom_base_path=saml_path)
     return auth
 
@@ -0,0 +1,58 @@
+-- Tables owned by the translation backend, next to the settings tables provisioned with the database.
+-- Apply with: psql "$DATABASE_URL" -f schema.sql
+-- Every statement is idempotent, so the file can be re-applied after an upgrade.
+-- With DB_AUTO_MIGRATE=true each worker applies it at startup instead (its role then needs CREATE rights).
+
+-- Segment-level translation memory (translation_memory.py)
+CREATE TABLE IF NOT EXISTS translation_memory (
+    cache_key TEXT PRIMARY KEY,
+    vendor TEXT NOT NULL,
+    source_lang TEXT,
+    target_lang TEXT NOT NULL,
+    translated_text TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    expires_at TIMESTAMP
+);
+
+-- DeepL glossaries reused by content hash (glossary_registry.py)
+CREATE TABLE IF NOT EXISTS deepl_glossaries (
+    entries_hash TEXT PRIMARY KEY,
+    glossary_id TEXT NOT NULL,
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    last_used_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+-- Translated documents reused across requests (document_cache.py)
+CREATE TABLE IF NOT EXISTS document_cache (
+    cache_key TEXT PRIMARY KEY,
+    vendor TEXT NOT NULL,
+    source_lang TEXT,
+    target_lang TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    blob_name TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL DEFAULT 0,
+    account_name TEXT NOT NULL,  -- Storage account holding the blob (Azure: the tenant's)
+    evicting BOOLEAN NOT NULL DEFAULT FALSE,  -- Being deleted; no longer handed out
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    last_used_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+-- Azure document translation jobs, polled by whichever worker holds the lease (azure_jobs.py)
+CREATE TABLE IF NOT EXISTS azure_document_jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params JSONB NOT NULL,
+    details JSONB,
+    summary JSONB,
+    sas_urls JSONB,
+    error TEXT,
+    document_bytes BIGINT,
+    claimed_by TEXT,
+    lease_expires_at TIMESTAMP,
+    submitted_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    updated_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    finished_at TIMESTAMP
+);
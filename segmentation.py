@@ -0,0 +1,54 @@
+import os
+import re
+
+# Texts shorter than this are translated as one block
+SEGMENT_MIN_CHARS = int(os.getenv('SEGMENT_MIN_CHARS', '400'))
+
+# Boundaries: line breaks (with surrounding spaces), whitespace after sentence-final
+# punctuation unless a lowercase letter follows or the full stop ends a common
+# abbreviation, and right after CJK full stops.
+_BOUNDARY = re.compile(
+    r'(\s*\n\s*'
+    r'|(?<=[.!?…。！？])(?<!\b(?:Mr|Dr|St|No|vs|Jr|Sr)\.)(?<!\bMrs\.)(?<!\b(?:e\.g|i\.e)\.)[ \t]+(?![a-z])'
+    r'|(?<=[。！？]))'
+)
+
+
+def should_segment(text):
+    return len(text) >= SEGMENT_MIN_CHARS
+
+
+def split_text(text):
+    """Split text into (piece, translatable) pairs whose concatenation is the original text.
+
+    Translatable pieces are sentences or lines without surrounding whitespace; every
+    other piece is whitespace that must be copied to the output unchanged.
+    """
+    pieces = []
+    for index, part in enumerate(_BOUNDARY.split(text)):
+        if not part:
+            continue
+        if index % 2:
+            pieces.append((part, False))
+            continue
+        core = part.strip()
+        if not core:
+            pieces.append((part, False))
+            continue
+        start = part.index(core)
+        if start:
+            pieces.append((part[:start], False))
+        pieces.append((core, True))
+        if start + len(core) < len(part):
+            pieces.append((part[start + len(core):], False))
+    return pieces
+
+
+def segments_of(pieces):
+    return [piece for piece, translatable in pieces if translatable]
+
+
+def reassemble(pieces, translations):
+    """Put translated segments back between the original whitespace."""
+    translations = iter(translations)
+    return ''.join(next(translations) if translatable else piece for piece, translatable in pieces)
@@ -0,0 +1,161 @@
+import logging
+import os
+import select
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+from db_connection import connect_db, get_connection
+
+# Safety net: even without notifications a cached row is re-read after this many seconds
+SETTINGS_CACHE_TTL = int(os.getenv('SETTINGS_CACHE_TTL', '300'))
+# Postgres channel used to tell every worker process that a settings row changed
+NOTIFY_CHANNEL = os.getenv('SETTINGS_NOTIFY_CHANNEL', 'settings_changed')
+LISTEN_ENABLED = os.getenv('SETTINGS_CACHE_LISTEN', 'true').lower() == 'true'
+LISTEN_RETRY_INTERVAL = 30
+
+AZURE_SETTINGS_TABLE = 'settings'
+DEEPL_SETTINGS_TABLE = 'deepl_settings'
+
+# (table, admin_id) -> (loaded_at, settings dict)
+_cache = {}
+# (table, admin_id) -> invalidation count, plus one count for clearing everything;
+# a read only fills the cache if neither moved while it was loading
+_generations = {}
+_clear_generation = 0
+_cache_lock = threading.Lock()
+_listener_thread = None
+_listener_lock = threading.Lock()
+
+
+def _load_azure_settings(cursor, admin_id):
+    cursor.execute("""
+        SELECT key, text_translation_endpoint, document_translation_endpoint, region, storage_connection_string
+        FROM settings
+        WHERE admin_id = %s;
+    """, (admin_id,))
+    result = cursor.fetchone()
+    if not result:
+        return None
+    return {
+        'key': result[0],
+        'text_translation_endpoint': result[1],
+        'document_translation_endpoint': result[2],
+        'region': result[3],
+        'storage_connection_string': result[4]
+    }
+
+
+def _load_deepl_settings(cursor, admin_id):
+    cursor.execute("SELECT api_key FROM deepl_settings WHERE admin_id = %s;", (admin_id,))
+    result = cursor.fetchone()
+    if not result:
+        return None
+    return {'api_key': result[0]}
+
+
+_LOADERS = {
+    AZURE_SETTINGS_TABLE: _load_azure_settings,
+    DEEPL_SETTINGS_TABLE: _load_deepl_settings,
+}
+
+
+def _get_settings(table, admin_id):
+    _ensure_listener()
+    cache_key = (table, str(admin_id))
+
+    cached = _cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL:
+        return dict(cached[1])
+
+    with _cache_lock:
+        generation = (_clear_generation, _generations.get(cache_key, 0))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        settings = _LOADERS[table](cursor, admin_id)
+        cursor.close()
+
+    # Missing rows are not cached so a first save shows up immediately
+    if settings is not None:
+        with _cache_lock:
+            if generation == (_clear_generation, _generations.get(cache_key, 0)):
+                _cache[cache_key] = (time.monotonic(), settings)
+        return dict(settings)
+    return None
+
+
+def get_azure_settings(admin_id):
+    """Azure settings row for admin_id as a dict, or None if there is none."""
+    return _get_settings(AZURE_SETTINGS_TABLE, admin_id)
+
+
+def get_deepl_settings(admin_id):
+    """DeepL settings row for admin_id as a dict, or None if there is none."""
+    return _get_settings(DEEPL_SETTINGS_TABLE, admin_id)
+
+
+def invalidate(table, admin_id):
+    """Drop the cached row in this process, and keep a read already in flight from putting it back."""
+    cache_key = (table, str(admin_id))
+    with _cache_lock:
+        _generations[cache_key] = _generations.get(cache_key, 0) + 1
+        _cache.pop(cache_key, None)
+
+
+def _clear_cache():
+    global _clear_generation
+    with _cache_lock:
+        _clear_generation += 1
+        _cache.clear()
+
+
+def publish_invalidation(cursor, table, admin_id):
+    """Queue a NOTIFY on the writer's transaction; other workers drop the row once it commits."""
+    cursor.execute("SELECT pg_notify(%s, %s);", (NOTIFY_CHANNEL, f"{table}:{admin_id}"))
+
+
+def _handle_notification(payload):
+    table, _, admin_id = payload.partition(':')
+    if table in _LOADERS and admin_id:
+        invalidate(table, admin_id)
+        logging.info(f"Settings cache invalidated for {table} admin_id {admin_id}.")
+
+
+def _listen_forever():
+    while True:
+        conn = None
+        try:
+            # LISTEN holds its connection for good, so it gets a dedicated one outside the pool
+            conn = connect_db()
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL};")
+            # Anything cached before LISTEN took effect may have missed a change
+            _clear_cache()
+            logging.info(f"Listening for settings changes on channel '{NOTIFY_CHANNEL}'.")
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _handle_notification(conn.notifies.pop(0).payload)
+        except Exception as e:
+            logging.warning(f"Settings change listener stopped, retrying in {LISTEN_RETRY_INTERVAL}s: {e}")
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(LISTEN_RETRY_INTERVAL)
+
+
+def _ensure_listener():
+    global _listener_thread
+    if not LISTEN_ENABLED or (_listener_thread is not None and _listener_thread.is_alive()):
+        return
+    with _listener_lock:
+        if _listener_thread is None or not _listener_thread.is_alive():
+            _listener_thread = threading.Thread(target=_listen_forever, name='settings-listener', daemon=True)
+            _listener_thread.start()
@@ -0,0 +1,100 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# Long-lived containers shared by every job; each job writes under its own prefix
+SOURCE_CONTAINER = os.getenv('AZURE_SOURCE_CONTAINER', 'translation-source')
+TARGET_CONTAINER = os.getenv('AZURE_TARGET_CONTAINER', 'translation-target')
+GLOSSARY_CONTAINER = os.getenv('AZURE_GLOSSARY_CONTAINER', 'translation-glossary')
+SHARED_CONTAINERS = (SOURCE_CONTAINER, TARGET_CONTAINER, GLOSSARY_CONTAINER)
+
+PREFIX_TIME_FORMAT = '%Y%m%d/%H%M%S'
+
+# (account_name, container_name) pairs known to exist in this process
+_known_containers = set()
+_known_lock = threading.Lock()
+
+
+def new_job_prefix(now=None):
+    """Unique virtual directory for one job: 'YYYYMMDD/HHMMSS-<uuid>/'.
+
+    The date comes first so cleanup can list a whole day with one prefix, and the
+    uuid keeps concurrent jobs started in the same second apart.
+    """
+    now = now or datetime.utcnow()
+    return f"{now.strftime(PREFIX_TIME_FORMAT)}-{uuid.uuid4().hex}/"
+
+
+def prefix_timestamp(prefix):
+    """Creation time encoded in a job prefix, or None if it is not one."""
+    try:
+        day, _, rest = prefix.strip('/').partition('/')
+        return datetime.strptime(f"{day}/{rest.split('-', 1)[0]}", PREFIX_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def ensure_container(blob_service_client, container_name):
+    """Create a shared container the first time this process needs it."""
+    key = (blob_service_client.account_name, container_name)
+    if key in _known_containers:
+        return
+    from azure.core.exceptions import ResourceExistsError
+    try:
+        blob_service_client.create_container(container_name)
+        logging.info(f"Container '{container_name}' created successfully.")
+    except ResourceExistsError:
+        pass
+    with _known_lock:
+        _known_containers.add(key)
+
+
+def ensure_shared_containers(blob_service_client, container_names=SHARED_CONTAINERS):
+    for container_name in container_names:
+        ensure_container(blob_service_client, container_name)
+
+
+def delete_prefix(container_client, prefix):
+    """Delete every blob under a job prefix; returns the number of blobs removed."""
+    blob_names = [blob.name for blob in container_client.list_blobs(name_starts_with=prefix)]
+    # delete_blobs accepts at most 256 blobs per batch request
+    for start in range(0, len(blob_names), 256):
+        container_client.delete_blobs(*blob_names[start:start + 256])
+    return len(blob_names)
+
+
+def last_modified(container_client, prefix):
+    """Newest last-modified time (naive UTC) of the blobs under a prefix, or None if it is empty."""
+    newest = None
+    for blob in container_client.list_blobs(name_starts_with=prefix):
+        modified = blob.last_modified.astimezone(timezone.utc).replace(tzinfo=None)
+        newest = max(newest or modified, modified)
+    return newest
+
+
+def expired_job_prefixes(container_client, cutoff):
+    """Yield (prefix, last_modified) for job prefixes in a shared container untouched since cutoff (UTC).
+
+    Age counts from the newest blob, not from the prefix name: a job's outputs are
+    written when it finishes, which can be long after the prefix was dated.
+    """
+    for day in container_client.walk_blobs(delimiter='/'):
+        day_name = day.name
+        if not day_name.endswith('/'):
+            continue
+        try:
+            # Skip whole days that are newer than the cutoff without listing them
+            if datetime.strptime(day_name.strip('/'), '%Y%m%d').date() > cutoff.date():
+                continue
+        except ValueError:
+            continue
+        for job in container_client.walk_blobs(name_starts_with=day_name, delimiter='/'):
+            created = prefix_timestamp(job.name)
+            # Nothing under a prefix is older than the prefix itself, so newer ones need no listing
+            if not (job.name.endswith('/') and created and created < cutoff):
+                continue
+            modified = last_modified(container_client, job.name)
+            if modified and modified < cutoff:
+                yield job.name, modified
@@ -43,7 +43,7 @@
 from flask import jsonify
 import psycopg2
 from psycopg2 import sql
-from db_connection import connect_db  # Import the connection function from a shared module
+from db_connection import get_connection  # Import the pooled connection from a shared module
 
 def store_feedback(feedback_data):
     """Store user feedback in the database."""
@@ -57,31 +57,27 @@ def store_feedback(feedback_data):
     vendor = feedback_data.get('vendor')
 
     try:
-        conn = connect_db()  # Use the connection function from your db module
-        cursor = conn.cursor()
-
-        insert_query = sql.SQL("""
-            INSERT INTO user_feedback (
-                user_name, feedback_text, source_language, 
-                target_language, document_name, 
-                source_text, translated_text, vendor
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """)
-
-        cursor.execute(insert_query, (user_name, feedback_text, source_language,
-                                      target_language, document_name,
-                                      source_text, translated_text, vendor))
-        conn.commit()
+        with get_connection() as conn:  # Borrow a pooled connection from the shared db module
+            cursor = conn.cursor()
+
+            insert_query = sql.SQL("""
+                INSERT INTO user_feedback (
+                    user_name, feedback_text, source_language, 
+                    target_language, document_name, 
+                    source_text, translated_text, vendor
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """)
+
+            cursor.execute(insert_query, (user_name, feedback_text, source_language,
+                                          target_language, document_name,
+                                          source_text, translated_text, vendor))
+            conn.commit()
+            cursor.close()
         return jsonify({"message": "Feedback added successfully"}), 201
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
-
 
 
 
@@ -0,0 +1,115 @@
+import io
+import threading
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('azure.storage.blob')
+pytest.importorskip('psycopg2')
+pytest.importorskip('requests')
+
+import docu_trans_azure2  # noqa: E402
+from storage_layout import SOURCE_CONTAINER  # noqa: E402
+
+THREADS = 16
+
+SETTINGS = {
+    'key': 'translator-key',
+    'text_translation_endpoint': 'https://api.example.test/',
+    'document_translation_endpoint': 'https://documents.example.test/',
+    'storage_connection_string': 'DefaultEndpointsProtocol=https;AccountName=testaccount;AccountKey=dGVzdA==',
+}
+
+
+class FakeBlobClient:
+    def __init__(self, service, container_name, blob_name):
+        self.service = service
+        self.container_name = container_name
+        self.blob_name = blob_name
+        self._blocks = {}
+
+    def stage_block(self, block_id, data, length=None):
+        self._blocks[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, content_settings=None):
+        data = b''.join(self._blocks[block.id] for block in block_list)
+        with self.service.lock:
+            self.service.blobs[(self.container_name, self.blob_name)] = data
+
+    def exists(self):
+        with self.service.lock:
+            return (self.container_name, self.blob_name) in self.service.blobs
+
+
+class FakeContainerClient:
+    def __init__(self, service, container_name):
+        self.service = service
+        self.container_name = container_name
+
+    def get_blob_client(self, blob_name):
+        return FakeBlobClient(self.service, self.container_name, blob_name)
+
+
+class FakeBlobServiceClient:
+    """In-memory stand-in for the one BlobServiceClient every job in a process shares."""
+
+    account_name = 'testaccount'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blobs = {}
+
+    def create_container(self, container_name):
+        pass
+
+    def get_container_client(self, container_name):
+        return FakeContainerClient(self, container_name)
+
+    def get_blob_client(self, container_name, blob_name):
+        return FakeBlobClient(self, container_name, blob_name)
+
+
+@pytest.fixture
+def blob_service_client(monkeypatch):
+    client = FakeBlobServiceClient()
+    monkeypatch.setattr(docu_trans_azure2, 'get_azure_settings', lambda admin_id: dict(SETTINGS))
+    monkeypatch.setattr(docu_trans_azure2, '_get_blob_service_client', lambda connection_string: client)
+    return client
+
+
+def test_concurrent_jobs_upload_under_their_own_prefix(blob_service_client):
+    barrier = threading.Barrier(THREADS)
+    prefixes = [None] * THREADS
+    errors = []
+
+    def job(index):
+        try:
+            context = docu_trans_azure2.create_job_context()
+            prefixes[index] = context.job_prefix
+            # Start every upload at once so the jobs really interleave
+            barrier.wait()
+            uploads = [
+                ('report.txt', docu_trans_azure2.upload_blob,
+                 (context, 'report.txt', io.BytesIO(f"job {index}".encode()), context.source_container_name,
+                  'de', 'text/plain', context.job_prefix)),
+                ('notes.txt', docu_trans_azure2.upload_blob,
+                 (context, 'notes.txt', io.BytesIO(f"notes {index}".encode()), context.source_container_name,
+                  'de', 'text/plain', context.job_prefix)),
+            ]
+            ok, results = docu_trans_azure2.upload_all(uploads)
+            assert ok, results
+        except Exception as e:  # Reported from the main thread below
+            errors.append(e)
+
+    threads = [threading.Thread(target=job, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(set(prefixes)) == THREADS
+    for index, prefix in enumerate(prefixes):
+        assert blob_service_client.blobs[(SOURCE_CONTAINER, f"{prefix}report-de.txt")] == f"job {index}".encode()
+        assert blob_service_client.blobs[(SOURCE_CONTAINER, f"{prefix}notes-de.txt")] == f"notes {index}".encode()
+    assert len(blob_service_client.blobs) == 2 * THREADS
@@ -1,79 +1,192 @@
-from flask import Flask, request, jsonify
+from flask import request, jsonify
 import logging
 import requests
+import http_client
 import json
 from urllib.parse import urlencode
 import uuid
-import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 import os
+from azure_languages import get_language_code
+from settings_cache import get_azure_settings
+import translation_memory
+import segmentation
 
-app = Flask(__name__)
+# Azure Translator limits per /translate call
+MAX_ELEMENTS_PER_REQUEST = 1000
+MAX_CHARACTERS_PER_REQUEST = 50000  # Counted once per target language
 
-# Database connection details
-host = os.getenv('DB_HOST')
-database = os.getenv('DB_NAME')
-user = os.getenv('DB_USER')
-password = os.getenv('DB_PASSWORD')
-port = os.getenv('DB_PORT')
-
-# Function to get supported languages from Azure Translator API
-def get_supported_languages(endpoint, api_key):
-    try:
-        url = f"{endpoint.rstrip('/')}/languages?api-version=3.0"
-        headers = {
-            'Ocp-Apim-Subscription-Key': api_key,
-            'Content-Type': 'application/json'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to retrieve supported languages: {str(e)}")
-        raise e
-
-# Function to convert language name to language code
-def get_language_code(language_name, supported_languages):
-    if supported_languages['translation'] is not None:
-        for key, value in supported_languages['translation'].items():
-            if value['name'].lower() == language_name.lower() or value['nativeName'].lower() == language_name.lower():
-                return key
-    return None  # Return None if the language is not supported
+# Upper bound on /translate calls in flight for this worker
+MAX_CONCURRENT_REQUESTS = int(os.getenv('AZURE_TEXT_MAX_CONCURRENT_REQUESTS', '4'))
+translation_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix='azure-text')
 
 def fetch_settings(admin_id):
     try:
-        # Establish connection to PostgreSQL
-        conn = psycopg2.connect(
-            host=host,
-            database=database,
-            user=user,
-            password=password,
-            port=port,
-            sslmode='require'  # Ensure secure connection with Cosmos DB for PostgreSQL
-        )
-
-        # Create a cursor object to interact with the database
-        cursor = conn.cursor()
-
-        # SQL query to fetch settings for the given admin_id
-        query = """
-        SELECT key, text_translation_endpoint, region 
-        FROM settings
-        WHERE admin_id = %s;
-        """
-        cursor.execute(query, (admin_id,))
-        result = cursor.fetchone()
-
-        # Close the cursor and connection
-        cursor.close()
-        conn.close()
-
-        return result  # Return the result directly
+        # Served from the in-process settings cache; only a miss touches PostgreSQL
+        settings = get_azure_settings(admin_id)
+        if not settings:
+            return None
+
+        return settings['key'], settings['text_translation_endpoint'], settings['region']
 
     except Exception as e:
         logging.error(f"Database error occurred: {e}", exc_info=True)
         return None  # Return None in case of an exception
 
-@app.route('/text_trans_azure', methods=['POST'])
+def plan_requests(texts, target_codes):
+    """Splits texts x target languages into requests that fit the Translator limits.
+
+    Azure counts every character once per target language, so a request may carry
+    at most MAX_ELEMENTS_PER_REQUEST texts and MAX_CHARACTERS_PER_REQUEST characters
+    multiplied by the number of targets. Returns a list of (target_codes, [indexes]).
+    """
+    longest = max(len(text) for text in texts)
+    group_size = max(1, min(len(target_codes), MAX_CHARACTERS_PER_REQUEST // max(longest, 1)))
+    target_groups = [target_codes[i:i + group_size] for i in range(0, len(target_codes), group_size)]
+
+    requests_plan = []
+    for targets in target_groups:
+        chunk, chunk_characters = [], 0
+        for index, text in enumerate(texts):
+            cost = len(text) * len(targets)
+            if chunk and (len(chunk) >= MAX_ELEMENTS_PER_REQUEST or chunk_characters + cost > MAX_CHARACTERS_PER_REQUEST):
+                requests_plan.append((targets, chunk))
+                chunk, chunk_characters = [], 0
+            chunk.append(index)
+            chunk_characters += cost
+        if chunk:
+            requests_plan.append((targets, chunk))
+    return requests_plan
+
+def _post_translate(constructed_url, key, region, texts, targets, source_language_code):
+    params = {
+        'api-version': '3.0',
+        'to': targets  # Use the converted language codes
+    }
+
+    # If source_language_code is provided, add it to the params
+    if source_language_code:
+        params['from'] = source_language_code
+
+    headers = {
+        'Ocp-Apim-Subscription-Key': key,
+        'Ocp-Apim-Subscription-Region': region,  # Correct region
+        'Content-type': 'application/json',
+        'X-ClientTraceId': str(uuid.uuid4())
+    }
+
+    body = [{'text': text} for text in texts]
+
+    response = http_client.post(constructed_url, params=params, headers=headers, json=body)
+    response.raise_for_status()  # Raise an error for HTTP error responses
+    return response.json()
+
+def translate_texts(texts, target_language_codes, source_language_code, text_translation_endpoint, key, region):
+    """Translates every text into every target language, in as few concurrent calls as the limits allow.
+
+    Pairs already in the translation memory are not sent again. Returns one element
+    per input text, in input order, shaped like the Translator response with the
+    translations for all targets merged together.
+    """
+    path = '/translate'
+    constructed_url = f"{text_translation_endpoint.rstrip('/')}{path}"
+
+    # Look up every (text, target) pair in the translation memory first
+    keys = {(index, target): translation_memory.make_key('azure', source_language_code, target, None, None, text)
+            for index, text in enumerate(texts) for target in target_language_codes}
+    cached = translation_memory.lookup(list(keys.values()))
+
+    # Repeated texts share their cache keys; only the first occurrence is sent
+    first_index = {}
+    for index, text in enumerate(texts):
+        first_index.setdefault(text, index)
+
+    # Group texts by the targets they still need so each group is planned as one batch
+    missing_groups = {}
+    for index in range(len(texts)):
+        if first_index[texts[index]] != index:
+            continue
+        missing = tuple(target for target in target_language_codes if keys[(index, target)] not in cached)
+        if missing:
+            missing_groups.setdefault(missing, []).append(index)
+
+    plan = []
+    for targets, indexes in missing_groups.items():
+        for plan_targets, positions in plan_requests([texts[index] for index in indexes], list(targets)):
+            plan.append((plan_targets, [indexes[position] for position in positions]))
+
+    futures = [
+        translation_executor.submit(_post_translate, constructed_url, key, region,
+                                    [texts[index] for index in indexes], targets, source_language_code)
+        for targets, indexes in plan
+    ]
+
+    fresh = {}
+    new_entries = {}
+    for (targets, indexes), future in zip(plan, futures):
+        for index, element in zip(indexes, future.result()):
+            if index in fresh:
+                fresh[index]['translations'].extend(element.get('translations', []))
+            else:
+                fresh[index] = element
+            for translation in element.get('translations', []):
+                cache_key = keys.get((index, translation.get('to')))
+                if cache_key:
+                    new_entries.setdefault(translation['to'], {})[cache_key] = translation['text']
+
+    for target, entries in new_entries.items():
+        translation_memory.store(entries, 'azure', source_language_code, target)
+
+    # Rebuild each element with the translations in the requested target order
+    merged = []
+    for index in range(len(texts)):
+        element = fresh.get(first_index[texts[index]], {})
+        by_target = {translation.get('to'): translation for translation in element.get('translations', [])}
+        translations = []
+        for target in target_language_codes:
+            if target in by_target:
+                translations.append(by_target[target])
+            elif keys[(index, target)] in cached:
+                translations.append({'text': cached[keys[(index, target)]], 'to': target})
+        merged.append(dict(element, translations=translations))
+    return merged
+
+def translate_segmented_texts(texts, target_language_codes, source_language_code, text_translation_endpoint, key, region):
+    """Like translate_texts, but long texts are split into sentences first.
+
+    Each sentence is looked up in the translation memory on its own, so editing one
+    sentence of a long text only sends that sentence to Azure. The translated
+    sentences are stitched back together around the original whitespace.
+    """
+    layouts = []
+    flat_texts = []
+    for text in texts:
+        if segmentation.should_segment(text):
+            pieces = segmentation.split_text(text)
+            segments = segmentation.segments_of(pieces)
+        else:
+            pieces, segments = None, [text]
+        layouts.append((pieces, len(flat_texts), len(segments)))
+        flat_texts.extend(segments)
+
+    elements = translate_texts(flat_texts, target_language_codes, source_language_code,
+                               text_translation_endpoint, key, region) if flat_texts else []
+
+    merged = []
+    for pieces, start, count in layouts:
+        parts = elements[start:start + count]
+        if pieces is None:
+            merged.append(parts[0])
+            continue
+        element = {name: value for name, value in parts[0].items() if name != 'translations'} if parts else {}
+        element['translations'] = [
+            {'text': segmentation.reassemble(pieces, [part['translations'][position]['text'] for part in parts]),
+             'to': target}
+            for position, target in enumerate(target_language_codes)
+        ]
+        merged.append(element)
+    return merged
+
 def text_trans_azure():
     logging.info('Processing translation request.')
 
@@ -90,56 +203,45 @@ def text_trans_azure():
     # Unpack the settings
     key, text_translation_endpoint, region = result
 
-    # Extract target language, source language, and text from the request
+    # Extract target language(s), source language, and text(s) from the request
     data = request.get_json()
-    target_language_name = data.get('target_language')
+    target_language_names = data.get('target_language')
     source_language_name = data.get('source_language')  # Optional source language
-    text_to_translate = data.get('text')
+    texts = data.get('text')
+
+    # Both fields accept either a single value or a list
+    if isinstance(target_language_names, str):
+        target_language_names = [target_language_names]
+    if isinstance(texts, str):
+        texts = [texts]
 
     # Ensure target_language is provided
-    if target_language_name and text_to_translate:
-        # Get supported languages
-        supported_languages = get_supported_languages(text_translation_endpoint, key)
+    if target_language_names and texts:
+        if not all(isinstance(text, str) and text for text in texts):
+            return jsonify({"error": "Every text must be a non-empty string."}), 400
+        if any(len(text) > MAX_CHARACTERS_PER_REQUEST for text in texts):
+            return jsonify({"error": f"Each text must be at most {MAX_CHARACTERS_PER_REQUEST} characters."}), 400
 
-        # Convert target language name to language code
-        target_language_code = get_language_code(target_language_name, supported_languages)
-        if not target_language_code:
-            return jsonify({"error": f"Target language '{target_language_name}' is not supported."}), 400
+        # Convert target language names to language codes (language metadata is cached)
+        target_language_codes = []
+        for target_language_name in target_language_names:
+            target_language_code = get_language_code(target_language_name, text_translation_endpoint, key)
+            if not target_language_code:
+                return jsonify({"error": f"Target language '{target_language_name}' is not supported."}), 400
+            if target_language_code not in target_language_codes:
+                target_language_codes.append(target_language_code)
 
         # Convert source language name to language code, if provided
         source_language_code = None
         if source_language_name:
-            source_language_code = get_language_code(source_language_name, supported_languages)
+            source_language_code = get_language_code(source_language_name, text_translation_endpoint, key)
             if not source_language_code:
                 return jsonify({"error": f"Source language '{source_language_name}' is not supported."}), 400
 
-        # Azure Translator API configuration
-        path = '/translate'
-        constructed_url = f"{text_translation_endpoint.rstrip('/')}{path}"
-
-        params = {
-            'api-version': '3.0',
-            'to': [target_language_code]  # Use the converted language code
-        }
-
-        # If source_language_code is provided, add it to the params
-        if source_language_code:
-            params['from'] = source_language_code
-
-        headers = {
-            'Ocp-Apim-Subscription-Key': key,
-            'Ocp-Apim-Subscription-Region': region,  # Correct region
-            'Content-type': 'application/json',
-            'X-ClientTraceId': str(uuid.uuid4())
-        }
-
-        body = [{'text': text_to_translate}]
-
         try:
-            # Make the request to the Azure Translator API
-            response = requests.post(constructed_url, params=params, headers=headers, json=body)
-            response.raise_for_status()  # Raise an error for HTTP error responses
-            response_json = response.json()
+            # Make the requests to the Azure Translator API
+            response_json = translate_segmented_texts(texts, target_language_codes, source_language_code,
+                                                      text_translation_endpoint, key, region)
 
             # Return the response in JSON format
             return jsonify(response_json), 200
@@ -152,6 +254,3 @@ def text_trans_azure():
             return jsonify({"error": f"Request error occurred: {req_err}"}), 500
     else:
         return jsonify({"error": "Please pass target_language and text in the request."}), 400
-
-if __name__ == '__main__':
-    app.run(debug=True)
@@ -1,10 +1,27 @@
-import deepl
+import json
 import os
+import threading
+from urllib.parse import quote_plus
 from flask import jsonify
+import translation_memory
+import segmentation
 
 # DeepL API key
 DEEPL_API_KEY = os.getenv('DEEPL_API_KEY')
-translator = deepl.Translator(DEEPL_API_KEY)
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """DeepL client, created on first use so importing this module stays cheap."""
+    global _translator
+    if _translator is None:
+        with _translator_lock:
+            if _translator is None:
+                import deepl
+                _translator = deepl.Translator(DEEPL_API_KEY)
+    return _translator
 
 # Language mapping
 language_mapping = {
@@ -49,6 +66,11 @@ language_mapping = {
 # Supported languages for formality
 formality_supported_languages = {"DE", "FR", "IT", "ES", "NL", "PL", "PT-BR", "PT-PT", "JA", "RU"}
 
+# DeepL request limits: at most 50 texts and 128 KiB of request body per call
+MAX_TEXTS_PER_REQUEST = 50
+MAX_REQUEST_BYTES = 120 * 1024  # Encoded body budget; leaves headroom for the other fields
+FIELD_OVERHEAD_BYTES = 8  # Field name and separator around each text
+
 def translate_text(text, target_lang_name, source_lang_name=None, formality='default', preserve_formatting=True):
     """Performs the translation using DeepL API."""
     if not text or not target_lang_name:
@@ -61,21 +83,157 @@ def translate_text(text, target_lang_name, source_lang_name=None, formality='def
     if target_lang is None:
         raise ValueError(f"Invalid target language: '{target_lang_name}'. Please provide a valid language name.")
 
+    # Repeated strings are answered from the translation memory without using quota
+    cache_key = translation_memory.make_key('deepl', source_lang, target_lang, formality, None, text)
+    cached = translation_memory.lookup([cache_key])
+    if cache_key in cached:
+        return cached[cache_key]
+
+    # Long texts go sentence by sentence so unchanged sentences are not billed again
+    if segmentation.should_segment(text):
+        pieces = segmentation.split_text(text)
+        results = translate_segments(segmentation.segments_of(pieces), target_lang_name, source_lang_name, formality)
+        errors = [result['error'] for result in results if 'error' in result]
+        if errors:
+            raise RuntimeError(errors[0])
+        translated_text = segmentation.reassemble(pieces, [result['translated_text'] for result in results])
+        translation_memory.store({cache_key: translated_text}, 'deepl', source_lang, target_lang)
+        return translated_text
+
     try:
         # Perform the translation
-        result = translator.translate_text(
+        result = get_translator().translate_text(
             text,
             source_lang=source_lang,
             target_lang=target_lang,
             formality=formality,
             preserve_formatting=True  # Always true
         )
-        return result.text
     except Exception as e:
         raise RuntimeError(f"Translation failed: {str(e)}")
 
+    translation_memory.store({cache_key: result.text}, 'deepl', source_lang, target_lang)
+    return result.text
+
+def _encoded_size(text):
+    """Bytes text takes up in the request body.
+
+    DeepL's limit applies to the encoded body, where non-ASCII text grows: JSON
+    escapes it as \\uXXXX and form encoding as %XX per UTF-8 byte. The larger of
+    the two is used, so the budget holds whichever encoding the client sends.
+    """
+    return max(len(json.dumps(text)), len(quote_plus(text))) + FIELD_OVERHEAD_BYTES
+
+def _pack_batches(segments):
+    """Groups segments by context and packs each group into as few requests as the limits allow."""
+    by_context = {}
+    for index, text, context in segments:
+        by_context.setdefault(context, []).append((index, text))
+
+    batches = []
+    for context, items in by_context.items():
+        # The context is sent with every batch and counts against the same limit
+        context_bytes = _encoded_size(context) if context else 0
+        batch, batch_bytes = [], context_bytes
+        for index, text in items:
+            text_bytes = _encoded_size(text)
+            if batch and (len(batch) >= MAX_TEXTS_PER_REQUEST or batch_bytes + text_bytes > MAX_REQUEST_BYTES):
+                batches.append((context, batch))
+                batch, batch_bytes = [], context_bytes
+            batch.append((index, text))
+            batch_bytes += text_bytes
+        if batch:
+            batches.append((context, batch))
+    return batches
+
+def translate_segments(segments, target_lang_name, source_lang_name=None, formality='default'):
+    """Translates a list of segments (strings or {'text', 'context'} dicts) in as few DeepL calls as possible.
+
+    Returns one result per input segment, in input order, each holding either
+    'translated_text' or 'error'.
+    """
+    source_lang = language_mapping.get(source_lang_name) if source_lang_name else None
+    target_lang = language_mapping.get(target_lang_name)
+
+    if target_lang is None:
+        raise ValueError(f"Invalid target language: '{target_lang_name}'. Please provide a valid language name.")
+
+    results = [None] * len(segments)
+    valid = []
+    for index, segment in enumerate(segments):
+        text, context = (segment.get('text'), segment.get('context')) if isinstance(segment, dict) else (segment, None)
+        if not isinstance(text, str) or not text.strip():
+            results[index] = {'index': index, 'error': 'Segment text must be a non-empty string.'}
+        elif context is not None and not isinstance(context, str):
+            results[index] = {'index': index, 'error': 'Segment context must be a string.'}
+        elif _encoded_size(text) + (_encoded_size(context) if context else 0) > MAX_REQUEST_BYTES:
+            results[index] = {'index': index, 'error': 'Segment exceeds the DeepL request size limit.'}
+        else:
+            valid.append((index, text, context))
+
+    # Answer what we can from the translation memory and only send the misses
+    keys = {index: translation_memory.make_key('deepl', source_lang, target_lang, formality, None, text, context)
+            for index, text, context in valid}
+    cached = translation_memory.lookup(list(keys.values()))
+    # Repeated segments share a key; send each one once and fan the result out to every index
+    sharing = {}
+    misses = []
+    for index, text, context in valid:
+        if keys[index] in cached:
+            results[index] = {'index': index, 'translated_text': cached[keys[index]]}
+        elif keys[index] in sharing:
+            sharing[keys[index]].append(index)
+        else:
+            sharing[keys[index]] = [index]
+            misses.append((index, text, context))
+
+    for context, batch in _pack_batches(misses):
+        options = {'context': context} if context else {}
+        try:
+            translated = get_translator().translate_text(
+                [text for _, text in batch],
+                source_lang=source_lang,
+                target_lang=target_lang,
+                formality=formality,
+                preserve_formatting=True,  # Always true
+                **options
+            )
+            for (index, _), result in zip(batch, translated):
+                for shared_index in sharing[keys[index]]:
+                    results[shared_index] = {'index': shared_index, 'translated_text': result.text}
+            translation_memory.store({keys[index]: result.text for (index, _), result in zip(batch, translated)},
+                                     'deepl', source_lang, target_lang)
+        except Exception as e:
+            for index, _ in batch:
+                for shared_index in sharing[keys[index]]:
+                    results[shared_index] = {'index': shared_index, 'error': f"Translation failed: {str(e)}"}
+
+    return results
+
+def handle_batch_translation_request(data):
+    """Handles a batch request carrying a list of 'segments'."""
+    segments = data.get('segments')
+    target_language = data.get('target_language')
+    source_language = data.get('source_language', None)
+
+    if not isinstance(segments, list) or not segments or not target_language:
+        return jsonify({'error': 'Please provide a non-empty segments list and target_language'}), 400
+
+    formality = data.get('formality', 'default')
+
+    try:
+        results = translate_segments(segments, target_language, source_language, formality)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    status_code = 200 if any('translated_text' in result for result in results) else 500
+    return jsonify({'translations': results}), status_code
+
 def handle_translation_request(data):
     """Handles the translation request and returns the appropriate response."""
+    if 'segments' in data:
+        return handle_batch_translation_request(data)
+
     text = data.get('text')
     target_language = data.get('target_language')
     source_language = data.get('source_language', None)
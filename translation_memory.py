@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import jsonify
+from db_connection import get_connection
+
+# Translation memory configuration
+TM_ENABLED = os.getenv('TM_ENABLED', 'true').lower() == 'true'
+TM_MEMORY_SIZE = int(os.getenv('TM_MEMORY_SIZE', '10000'))  # Entries kept in the in-process LRU
+TM_DEFAULT_TTL = int(os.getenv('TM_DEFAULT_TTL', str(30 * 24 * 3600)))  # 30 days
+TM_DB_ENABLED = os.getenv('TM_DB_ENABLED', 'true').lower() == 'true'
+
+# cache_key -> (translated_text, expires_at monotonic)
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0, 'db_errors': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat, amount=1):
+    with _stats_lock:
+        _stats[stat] += amount
+
+
+def normalize_text(text):
+    # Only canonical Unicode composition; whitespace is part of what gets translated
+    return unicodedata.normalize('NFC', text)
+
+
+def make_key(vendor, source_lang, target_lang, formality, glossary, text, context=None):
+    """Cache key for one text under one set of translation options."""
+    text_hash = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest() if context else ''
+    parts = [vendor, source_lang or 'auto', target_lang, formality or 'default', glossary or '', context_hash, text_hash]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _memory_get(cache_key):
+    with _memory_lock:
+        entry = _memory.get(cache_key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del _memory[cache_key]
+            return None
+        _memory.move_to_end(cache_key)
+        return entry[0]
+
+
+def _memory_put(cache_key, translated_text, ttl):
+    with _memory_lock:
+        _memory[cache_key] = (translated_text, time.monotonic() + ttl)
+        _memory.move_to_end(cache_key)
+        while len(_memory) > TM_MEMORY_SIZE:
+            _memory.popitem(last=False)
+
+
+def lookup(keys):
+    """Return {cache_key: translated_text} for every key found in memory or in PostgreSQL."""
+    if not TM_ENABLED or not keys:
+        return {}
+
+    unique_keys = list(dict.fromkeys(keys))
+    found = {}
+    remaining = []
+    for cache_key in unique_keys:
+        translated_text = _memory_get(cache_key)
+        if translated_text is None:
+            remaining.append(cache_key)
+        else:
+            found[cache_key] = translated_text
+    _count('memory_hits', len(found))
+
+    if remaining and TM_DB_ENABLED:
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT cache_key, translated_text,
+                           EXTRACT(EPOCH FROM (expires_at - (now() AT TIME ZONE 'utc')))
+                    FROM translation_memory
+                    WHERE cache_key = ANY(%s)
+                      AND (expires_at IS NULL OR expires_at > (now() AT TIME ZONE 'utc'));
+                """, (remaining,))
+                rows = cursor.fetchall()
+                cursor.close()
+            for cache_key, translated_text, remaining_ttl in rows:
+                found[cache_key] = translated_text
+                # Promote to the in-process tier for the rest of the entry's lifetime
+                _memory_put(cache_key, translated_text, float(remaining_ttl) if remaining_ttl is not None else TM_DEFAULT_TTL)
+            _count('db_hits', len(rows))
+        except Exception as e:
+            _count('db_errors')
+            logging.warning(f"Translation memory lookup failed, translating without it: {e}")
+
+    _count('misses', len(unique_keys) - len(found))
+    return found
+
+
+def store(entries, vendor, source_lang, target_lang, ttl=None):
+    """Save {cache_key: translated_text} in both tiers with a per-entry TTL in seconds."""
+    if not TM_ENABLED or not entries:
+        return
+    ttl = ttl or TM_DEFAULT_TTL
+
+    for cache_key, translated_text in entries.items():
+        _memory_put(cache_key, translated_text, ttl)
+    _count('stores', len(entries))
+
+    if not TM_DB_ENABLED:
+        return
+    try:
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO translation_memory (cache_key, vendor, source_lang, target_lang, translated_text, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (cache_key) DO UPDATE
+                SET translated_text = EXCLUDED.translated_text,
+                    expires_at = EXCLUDED.expires_at;
+            """, [(cache_key, vendor, source_lang, target_lang, translated_text, expires_at)
+                  for cache_key, translated_text in entries.items()])
+            conn.commit()
+            cursor.close()
+    except Exception as e:
+        _count('db_errors')
+        logging.warning(f"Failed to persist translation memory entries: {e}")
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    with _memory_lock:
+        stats['memory_entries'] = len(_memory)
+    stats['memory_capacity'] = TM_MEMORY_SIZE
+    lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+    stats['hit_ratio'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def cache_stats_route():
+    return jsonify(cache_stats()), 200